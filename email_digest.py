@@ -0,0 +1,154 @@
+# ======= resumo periódico das submissões para o professor =======
+import json
+import os
+import sqlite3
+import threading
+import time
+from email.mime.text import MIMEText
+from typing import List
+
+from email_helper import fmt
+from email_outbox import Outbox
+from engine.dre import DRE
+
+EMAIL_PROFESSOR = os.getenv("EMAIL_PROFESSOR", "santanajr.prof@gmail.com")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS digest (
+    id INTEGER PRIMARY KEY,
+    criada_em REAL NOT NULL,
+    dados TEXT NOT NULL,
+    lote INTEGER,
+    enfileirado INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS digest_lote ON digest (lote, enfileirado);
+"""
+
+_COLUNAS = [
+    ("Nome", "nome", 20),
+    ("E-mail", "email", 26),
+    ("Local", "local", 14),
+    ("Mkt", "marketing", 11),
+    ("Receb.", "recebimento", 7),
+    ("Mês 1", "mes1", 14),
+    ("Mês 2", "mes2", 14),
+    ("Mês 3", "mes3", 14),
+    ("Lucro", "lucro", 12),
+    ("Caixa mar", "caixa", 12),
+    ("Juros", "juros", 10),
+]
+
+
+def _tabela(linhas: List[dict]) -> str:
+    def cel(valor, largura: int) -> str:
+        texto = str(valor)
+        return texto[:largura].ljust(largura)
+
+    cabecalho = " ".join(cel(titulo, largura) for titulo, _, largura in _COLUNAS)
+    corpo = [" ".join(cel(linha[chave], largura) for _, chave, largura in _COLUNAS) for linha in linhas]
+    return "\n".join([cabecalho, "-" * len(cabecalho)] + corpo)
+
+
+class DigestProfessor:
+    """
+    Acumula as cópias do professor (no mesmo SQLite do outbox) e manda um único
+    e-mail de resumo a cada `a_cada` submissões ou `minutos` minutos, o que vier
+    primeiro. O e-mail de cada aluno continua saindo individualmente.
+
+    Descarregar é feito em duas etapas: as linhas pendentes recebem um número de
+    lote e depois o lote é enfileirado com a chave "digest-<lote>". Se o processo
+    cair no meio, o mesmo lote é reenfileirado com a mesma chave e o outbox ignora
+    a duplicata.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        remetente: str,
+        professor: str = EMAIL_PROFESSOR,
+        a_cada: int = 30,
+        minutos: float = 10.0,
+    ):
+        self.outbox = outbox
+        self.remetente = remetente
+        self.professor = professor
+        self.a_cada = a_cada
+        self.minutos = minutos
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(outbox.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        outbox.agendar(self.verificar)
+
+    def adicionar(self, nome: str, email: str, decisao: tuple, dre: DRE) -> None:
+        local, marketing, recebimento, q1, q2, q3, p1, p2, p3 = decisao
+        dados = {
+            "nome": nome,
+            "email": email,
+            "local": local,
+            "marketing": marketing,
+            "recebimento": recebimento,
+            "mes1": f"{q1} {p1}",
+            "mes2": f"{q2} {p2}",
+            "mes3": f"{q3} {p3}",
+            "lucro": fmt(dre.lucro_trimestre),
+            "caixa": fmt(dre.caixa[-1]),
+            "juros": fmt(sum(dre.despfin)),
+        }
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO digest (criada_em, dados) VALUES (?, ?)", (time.time(), json.dumps(dados))
+            )
+        self.verificar()
+
+    def verificar(self) -> None:
+        """descarrega se bateu o número de submissões ou o tempo da mais antiga pendente"""
+        with self._lock:
+            n, mais_antiga = self._conn.execute(
+                "SELECT COUNT(*), MIN(criada_em) FROM digest WHERE lote IS NULL"
+            ).fetchone()
+        if n and (n >= self.a_cada or time.time() - mais_antiga >= self.minutos * 60):
+            self.descarregar()
+        else:
+            # lote marcado mas não enfileirado (queda entre as duas etapas)
+            self._enfileirar_lotes()
+
+    def descarregar(self) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE digest SET lote = (SELECT MAX(id) FROM digest WHERE lote IS NULL) WHERE lote IS NULL"
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._enfileirar_lotes()
+
+    def _enfileirar_lotes(self) -> None:
+        with self._lock:
+            lotes = [
+                lote for (lote,) in self._conn.execute(
+                    "SELECT DISTINCT lote FROM digest WHERE lote IS NOT NULL AND enfileirado = 0 ORDER BY lote"
+                )
+            ]
+            for lote in lotes:
+                linhas = [
+                    json.loads(dados) for (dados,) in self._conn.execute(
+                        "SELECT dados FROM digest WHERE lote = ? ORDER BY id", (lote,)
+                    )
+                ]
+                msg = MIMEText(
+                    f"Submissões recebidas desde o último resumo: {len(linhas)}\n\n{_tabela(linhas)}\n",
+                    "plain",
+                    "utf-8",
+                )
+                msg["Subject"] = f"Resumo da Atividade Competitiva ({len(linhas)} submissões)"
+                msg["From"] = self.remetente
+                msg["To"] = self.professor
+                self.outbox.enfileirar(self.remetente, [self.professor], msg.as_string(), chave=f"digest-{lote}")
+                self._conn.execute("UPDATE digest SET enfileirado = 1 WHERE lote = ?", (lote,))
+
+    def pendentes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM digest WHERE lote IS NULL").fetchone()[0]
@@ -1,9 +1,8 @@
 # ======= helpers e geração do corpo do email (q1..q37) =======
 import os
-import smtplib
-from email.mime.text import MIMEText
-from dataclasses import dataclass
-from typing import List, Tuple, Optional
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional
 import unicodedata
 
 # ---------------------------
@@ -14,25 +13,23 @@ def _strip_accents(s: str) -> str:
         return ""
     return "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
 
+@lru_cache(maxsize=256)
 def norm(s: str) -> str:
     """normaliza para minúsculas, sem espaços e sem acentos"""
     s = s or ""
     s = _strip_accents(s)
     return s.lower().replace(" ", "")
 
+_BR = str.maketrans(",.", ".,")
+
 def fmt(valor: float) -> str:
     """formata número no estilo BR (milhar com ponto, sem casas decimais)"""
     try:
         n = float(valor)
     except Exception:
         return str(valor)
-    s = f"{n:,.0f}"
-    return s.replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{n:,.0f}".translate(_BR)
 
-def shift_right(seq: List[float], k: int = 1) -> List[float]:
-    if k <= 0:
-        return seq[:]
-    return [0]*k + seq[:-k]
 
 # ---------------------------
 # Parâmetros padrão (espelham o R)
@@ -58,31 +55,120 @@ class Params:
     taxaesp: float = 0.15
     despmktfx: float = 5000
     despmktadc: float = 10000
+    # fatia do mercado (100 pacotes/mês) atingida em cada mês; depois do 3º fica no patamar de março
+    mercserra1: float = 0.2
+    mercserra2: float = 0.4
+    mercserra3: float = 0.6
+    mercpraia1: float = 0.6
+    mercpraia2: float = 0.7
+    mercpraia3: float = 0.8
+    fatmktcons: float = 1.1  # fator da demanda a partir do 2º mês (campanha conservadora)
+    fatmktagr: float = 1.2  # idem, campanha agressiva
+
+# campos de Params que entram em calcular_demanda
+CAMPOS_DEMANDA = ("mercserra1", "mercserra2", "mercserra3", "mercpraia1", "mercpraia2", "mercpraia3", "fatmktcons", "fatmktagr")
+
+# perfis nomeados: "r" é o script R original; "atividade" é o enunciado do app
+PERFIS: Dict[str, Params] = {
+    "r": Params(),
+    "atividade": Params(
+        alserra=5000, alpraia=20000, taxainad=0.15, capital=70000, despmktadc=20000,
+        mercserra2=0.35, mercserra3=0.5, mercpraia2=0.65, mercpraia3=0.7, fatmktagr=1.15,
+    ),
+}
+
+# perfil do app e das ferramentas de correção (recorrigir.py), o mesmo para todos
+PERFIL = os.getenv("PERFIL", "atividade")
+
+def perfil(nome: str = PERFIL) -> Params:
+    """Params de um perfil de PERFIS pelo nome (uma cópia: alterar não muda o perfil)"""
+    if nome not in PERFIS:
+        raise ValueError(f"perfil desconhecido: {nome!r} (esperado um de {tuple(PERFIS)})")
+    return replace(PERFIS[nome])
 
 # ---------------------------
 # Núcleo de cálculo
 # ---------------------------
-def calcular_demanda(local: str, marketing: str, recebimento: str) -> List[int]:
+def calcular_demanda(local: str, marketing: str, recebimento: str, meses: int = 3,
+                     params: Optional[Params] = None) -> List[int]:
+    p = params or Params()
     loc = norm(local)
     mkt = norm(marketing)
     rec = norm(recebimento)
 
-    # 1) Base por localização
+    # 1) Base por localização (depois do 3º mês a demanda fica no patamar de março)
     if loc == "serra":
-        base_vendas = [0.2, 0.4, 0.6]
+        base_vendas = [p.mercserra1, p.mercserra2, p.mercserra3]
     else:  # praia do canto
-        base_vendas = [0.6, 0.7, 0.8]
+        base_vendas = [p.mercpraia1, p.mercpraia2, p.mercpraia3]
     base_vendas = [x*100 for x in base_vendas]
+    base_vendas = (base_vendas + base_vendas[-1:] * meses)[:meses]
 
-    # 2) Fator marketing
-    fator_marketing = [1, 1.1, 1.1] if mkt == "conservador" else [1, 1.2, 1.2]
+    # 2) Fator marketing (o adicional só no 1º mês; o efeito continua nos seguintes)
+    fator = p.fatmktcons if mkt == "conservador" else p.fatmktagr
+    fator_marketing = [1] + [fator] * (meses - 1)
 
     # 3) Fator recebimento
     fator_receb = 1.0 if rec == "avista" else 1.1 if rec == "cartao" else 1.15
 
-    vendas_est = [round(base_vendas[i] * fator_marketing[i] * fator_receb) for i in range(3)]
+    vendas_est = [round(base_vendas[i] * fator_marketing[i] * fator_receb) for i in range(meses)]
     return vendas_est
 
+# ---------------------------
+# Prazos: cada política de recebimento/pagamento como um núcleo de defasagem
+# ---------------------------
+INICIO_PAGAMENTO = -1  # o adiantado é pago no mês anterior à entrega
+
+def nucleo_recebimento(p: Params, recebimento: str) -> List[float]:
+    """fração da receita do mês que entra no caixa no próprio mês e 1, 2 e 3 meses depois"""
+    rec = norm(recebimento)
+    vc, vb, tc, ti = p.vendacart, p.vendaboleto, p.taxacart, p.taxainad
+    if rec == "avista":
+        return [1.0, 0.0, 0.0, 0.0]
+    if rec == "cartao":  # 1x no cartão, menos a taxa da administradora
+        return [1 - vc, vc * (1 - tc), 0.0, 0.0]
+    # boleto em 3x sem juros, menos a inadimplência
+    return [1 - vc - vb, vc * (1 - tc) + vb / 3 * (1 - ti), vb / 3 * (1 - ti), vb / 3 * (1 - ti)]
+
+def nucleo_pagamento(p: Params, pag: str) -> List[float]:
+    """valor pago ao fornecedor por pacote, do mês anterior à entrega (INICIO_PAGAMENTO) até 2 meses depois"""
+    pag = norm(pag)
+    if pag == "adiantado":
+        return [p.pc * p.descomp, 0.0, 0.0, 0.0]
+    if pag == "avista":
+        return [0.0, p.pc, 0.0, 0.0]
+    parcela = p.pc * p.jurcomp / 3  # parcelado em 3x
+    return [0.0, parcela, parcela, parcela]
+
+def espalhar(valores: List[float], nucleos, inicio: int = 0) -> List[float]:
+    """
+    saida[k + inicio + j] += valores[k] * nucleo_k[j], descartando o que cai fora do horizonte.
+    `nucleos` é um núcleo só (mesma política em todos os meses) ou um por mês.
+    """
+    n = len(valores)
+    if nucleos and not isinstance(nucleos[0], (list, tuple)):
+        nucleos = [nucleos] * n
+    saida = [0.0] * n
+    for k, (v, nucleo) in enumerate(zip(valores, nucleos)):
+        for j, c in enumerate(nucleo):
+            t = k + inicio + j
+            if c and 0 <= t < n:
+                saida[t] += v * c
+    return saida
+
+def calcular_recebimentos(p: Params, recebimento: str, receita: List[float]) -> List[float]:
+    return espalhar(receita, nucleo_recebimento(p, recebimento))
+
+def calcular_pagamentos(p: Params, qnts: List[int], pags: List[str]) -> List[float]:
+    """fornecedor (conforme a forma de pagamento) + transporte à vista, mês a mês"""
+    nucleos = [nucleo_pagamento(p, pag) for pag in pags]
+    if norm(pags[0]) == "parcelado":
+        # as parcelas da compra do mês 1 vencem um mês depois; no trimestre é a
+        # réplica do R (a parcela do mês 1 não entra no caixa)
+        nucleos[0] = [0.0] + nucleos[0]
+    fornecedor = espalhar(qnts, nucleos, INICIO_PAGAMENTO)
+    return [f + p.transp * q for f, q in zip(fornecedor, qnts)]
+
 def calcular_custos_unitarios(p: Params, compra1pag: str, compra2pag: str, compra3pag: str) -> List[float]:
     def custo(pag: str) -> float:
         pag = norm(pag)
@@ -110,22 +196,7 @@ def calcular_fluxo_caixa(p: Params, local: str, marketing: str, recebimento: str
     else:
         caixa_marketing = [-(p.despmktfx+p.despmktadc), -p.despmktfx, -p.despmktfx]
 
-    if rec == "avista":
-        receb = receita[:]
-    elif rec == "cartao":
-        receb = [receita[i]*(1-p.vendacart) + shift_right([receita[j]*p.vendacart for j in range(3)])[i]*(1-p.taxacart)
-                 for i in range(3)]
-    else:  # boleto
-        part_cartao = shift_right([receita[j]*p.vendacart for j in range(3)])
-        part_bol_1 = shift_right([receita[j]*p.vendaboleto/3 for j in range(3)])
-        part_bol_2 = shift_right([receita[j]*p.vendaboleto/3 for j in range(3)], 2)
-        receb = [
-            receita[i]*(1-p.vendacart-p.vendaboleto)
-            + part_cartao[i]*(1-p.taxacart)
-            + part_bol_1[i]*(1-p.taxainad)
-            + part_bol_2[i]*(1-p.taxainad)
-            for i in range(3)
-        ]
+    receb = calcular_recebimentos(p, rec, receita)
     fc = [caixa_local[i] + caixa_marketing[i] + receb[i] - pagamentos[i] for i in range(3)]
     return fc
 
@@ -152,7 +223,7 @@ def generate_email_body(
     rec = norm(recebimento)
 
     # --- Demanda, saldo, venda, receita
-    demanda = calcular_demanda(local, marketing, recebimento)
+    demanda = calcular_demanda(local, marketing, recebimento, params=p)
 
     saldo = [0, 0, 0]
     saldo[0] = max(0, compra1qnt - demanda[0])
@@ -189,41 +260,9 @@ def generate_email_body(
     if rec in ("cartao", "boleto"):
         despcartao = [r*p.vendacart*p.taxacart for r in receita]
 
-    # --- Recebimentos a prazo (para FC)
-    cartaoreceb = [
-        receita[i]*(1-p.vendacart) + shift_right([receita[j]*p.vendacart for j in range(3)])[i]*(1-p.taxacart)
-        for i in range(3)
-    ]
-    boletoreceb = [
-        receita[i]*(1-p.vendacart-p.vendaboleto)
-        + shift_right([receita[j]*p.vendacart for j in range(3)])[i]*(1-p.taxacart)
-        + shift_right([receita[j]*p.vendaboleto/3 for j in range(3)])[i]*(1-p.taxainad)
-        + shift_right([receita[j]*p.vendaboleto/3 for j in range(3)], 2)[i]*(1-p.taxainad)
-        for i in range(3)
-    ]
-
-    # --- Pagamentos a fornecedores
+    # --- Pagamentos a fornecedores (recebimentos a prazo ficam em calcular_fluxo_caixa)
     qnts = [compra1qnt, compra2qnt, compra3qnt]
-
-    pagavista = [q*p.pc for q in qnts]
-    for i, pag in enumerate([compra1pag, compra2pag, compra3pag]):
-        if norm(pag) != "avista":
-            pagavista[i] = 0
-
-    pagadiant = [q*p.pc*p.descomp for q in qnts]
-    for i, pag in enumerate([compra1pag, compra2pag, compra3pag]):
-        if norm(pag) != "adiantado":
-            pagadiant[i] = 0
-    pagadiant = [pagadiant[1], pagadiant[2], 0]  # pago antes
-
-    pagparc_total = [q*p.pc*p.jurcomp for q in qnts]
-    for i, pag in enumerate([compra1pag, compra2pag, compra3pag]):
-        if norm(pag) != "parcelado":
-            pagparc_total[i] = 0
-    third = [x/3 for x in pagparc_total]
-    pagparc = [0, third[0] + third[1], third[0] + third[1] + third[2]]
-
-    pagamentos = [pagavista[i] + pagadiant[i] + pagparc[i] + p.transp*qnts[i] for i in range(3)]
+    pagamentos = calcular_pagamentos(p, qnts, [compra1pag, compra2pag, compra3pag])
 
     # --- FC, cheque especial e desp. financeira
     fc = calcular_fluxo_caixa(
@@ -252,6 +291,29 @@ def generate_email_body(
         despfin[2] = caixa[2]*p.taxaesp
         caixa[2] = caixa[2]*(1+p.taxaesp)
 
+    decisao = (local, marketing, recebimento, compra1qnt, compra2qnt, compra3qnt, compra1pag, compra2pag, compra3pag)
+    return renderizar_corpo(nome, decisao, venda, receita, despfin, p)
+
+def renderizar_corpo(
+    nome: str,
+    decisao: tuple,
+    venda: List[float],
+    receita: List[float],
+    despfin: List[float],
+    params: Optional[Params] = None,
+) -> str:
+    """
+    Texto do e-mail a partir dos números já calculados (venda, receita e despfin,
+    negativa, mês a mês): generate_email_body, ou a DRE de uma submissão.
+    decisao = (local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3).
+    """
+    p = params or Params()
+    local, marketing, recebimento, compra1qnt, compra2qnt, compra3qnt, compra1pag, compra2pag, compra3pag = decisao
+    loc = norm(local)
+    mkt = norm(marketing)
+    rec = norm(recebimento)
+    venda = [int(v) for v in venda]
+
     # --- Despesa de marketing por mês (para os textos)
     if mkt == "agressivo":
         despmkt = [p.despmktfx + p.despmktadc, p.despmktfx, p.despmktfx]
@@ -286,6 +348,7 @@ def generate_email_body(
            f"{fmt(round((p.movpraia if loc=='praiadocanto' else p.movserra)/3))} referente à primeira parcela dos móveis adquiridos.")
     q18 = (f"Em janeiro/20x1 foi adiantado ao fornecedor o valor de R$ {fmt(compra2qnt*p.pc*p.descomp)} referente a produtos ainda não entregues."
            if norm(compra2pag)=="adiantado" else "")
+    q19 = (f"Em janeiro/20x1, foi cobrado R$ {fmt(despfin[0])} de juros do cheque especial")
 
     # Fevereiro
     q21 = (f"Em fevereiro/20x1, foi pago o valor mensal de R$ {fmt(p.alpraia if loc=='praiadocanto' else p.alserra)} referente ao direito de uso do imóvel em fevereiro/20x1.")
@@ -310,6 +373,7 @@ def generate_email_body(
            if norm(compra3pag)=="adiantado" else "")
     q28 = (f"Em fevereiro/20x1 foi pago ao fornecedor o valor de R$ {fmt((p.pc*p.jurcomp*compra1qnt)/3)} referente a mercadorias anteriormente entregues."
            if norm(compra1pag)=="parcelado" else "")
+    q29 = (f"Em fevereiro/20x1, foi cobrado R$ {fmt(despfin[1])} de juros do cheque especial")
 
     # Março
     q31 = (f"Em março/20x1, foi pago o valor mensal de R$ {fmt(p.alpraia if loc=='praiadocanto' else p.alserra)} referente ao direito de uso do imóvel em março/20x1.")
@@ -332,11 +396,12 @@ def generate_email_body(
            f"{fmt(round((p.movpraia if loc=='praiadocanto' else p.movserra)/3))} referente à terceira parcela dos móveis adquiridos.")
     q37 = (f"Em março/20x1 foi pago ao fornecedor o valor de R$ {fmt((p.pc*p.jurcomp*compra1qnt)/3 + (p.pc*p.jurcomp*compra2qnt)/3 if norm(compra2pag)=='parcelado' else (p.pc*p.jurcomp*compra1qnt)/3)} referente a mercadorias anteriormente entregues."
            if (norm(compra1pag)=="parcelado" or norm(compra2pag)=="parcelado") else "")
+    q38 = (f"Em março/20x1, foi cobrado R$ {fmt(despfin[2])} de juros do cheque especial")
 
     # --- Coleta, subtítulos e numeração contínua
-    jan = [q11, q12, q13, q14, q15, q16, q17, q18]
-    fev = [q21, q22, q23, q24, q25, q26, q27, q28]
-    mar = [q31, q32, q33, q34, q35, q36, q37]
+    jan = [q11, q12, q13, q14, q15, q16, q17, q18, q19]
+    fev = [q21, q22, q23, q24, q25, q26, q27, q28, q29]
+    mar = [q31, q32, q33, q34, q35, q36, q37, q38]
 
     def enumerate_ops(items: List[str], start_idx: int) -> Tuple[List[str], int]:
         out = []
@@ -365,56 +430,10 @@ def generate_email_body(
 
     return "\n".join(body_lines)
 
-# ---------------------------
-# ENVIO DE E‑MAIL
-# ---------------------------
-def enviar_email(destinatario_aluno: str):
+def corpo_da_dre(nome: str, decisao: tuple, dre, params: Optional[Params] = None) -> str:
     """
-    Mantém a assinatura enviar_email(email) para uso no app.py.
-    Aqui, MONTAMOS o corpo a partir das variáveis que o app já possui.
-    >>> ATENÇÃO: substitua os placeholders abaixo pelas VARIÁVEIS reais do seu app.py,
-    >>> caso os nomes sejam diferentes.
+    Texto do e-mail a partir de uma engine.dre.DRE (despesas positivas): o único
+    caminho usado pela submissão, pelos registros e pela recorreção.
     """
-    # ===== SUBSTITUA estes nomes se no seu app.py forem diferentes =====
-    # (ex.: nome = st.session_state["nome"], etc.)
-    nome = nome          # já existente no seu app.py
-    local = local
-    marketing = marketing
-    recebimento = recebimento
-    compra1pag = compra1pag
-    compra2pag = compra2pag
-    compra3pag = compra3pag
-    compra1qnt = compra1qnt
-    compra2qnt = compra2qnt
-    compra3qnt = compra3qnt
-    # ===================================================================
-
-    corpo = generate_email_body(
-        nome=nome,
-        local=local,
-        marketing=marketing,
-        recebimento=recebimento,
-        compra1pag=compra1pag,
-        compra2pag=compra2pag,
-        compra3pag=compra3pag,
-        compra1qnt=compra1qnt,
-        compra2qnt=compra2qnt,
-        compra3qnt=compra3qnt,
-    )
-
-    remetente = os.getenv("EMAIL")
-    senha = os.getenv("SENHA_EMAIL")
-    if not remetente or not senha:
-        raise RuntimeError("Configurar EMAIL e SENHA_EMAIL no ambiente (Secrets).")
-
-    destinatarios = [destinatario_aluno, "santanajr.prof@gmail.com"]
-
-    msg = MIMEText(corpo, "plain", "utf-8")
-    msg["Subject"] = "Respostas da Atividade Competitiva"
-    msg["From"] = remetente
-    msg["To"] = ", ".join(destinatarios)
-
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as servidor:
-        servidor.login(remetente, senha)
-        servidor.sendmail(remetente, destinatarios, msg.as_string())
-    print("E‑mail enviado com sucesso.")
+    despfin = [-d if d else 0.0 for d in dre.despfin]  # negativa, como em generate_email_body
+    return renderizar_corpo(nome, decisao, dre.venda, dre.receita, despfin, params)
@@ -0,0 +1,250 @@
+# ======= fila de saída de e-mails (SQLite) com envio em segundo plano =======
+import json
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from smtp_pool import PoolSMTP
+
+# ---------------------------
+# Conexão SMTP
+# ---------------------------
+def conectar_gmail() -> smtplib.SMTP:
+    """abre a sessão SSL com o Gmail já autenticada (EMAIL e SENHA_EMAIL no ambiente)"""
+    remetente = os.getenv("EMAIL")
+    senha = os.getenv("SENHA_EMAIL")
+    if not remetente or not senha:
+        raise RuntimeError("Configurar EMAIL e SENHA_EMAIL no ambiente (Secrets).")
+    servidor = smtplib.SMTP_SSL("smtp.gmail.com", 465, timeout=30)
+    servidor.login(remetente, senha)
+    return servidor
+
+
+def _permanente(erro: Exception) -> bool:
+    """erros 5xx do servidor (e linhas corrompidas na fila) não melhoram com nova tentativa"""
+    if isinstance(erro, ValueError):  # destinatários ilegíveis, mensagem que não codifica
+        return True
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        return all(500 <= codigo < 600 for codigo, _ in erro.recipients.values())
+    codigo = getattr(erro, "smtp_code", None)
+    return isinstance(codigo, int) and 500 <= codigo < 600
+
+
+# ---------------------------
+# Outbox
+# ---------------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mensagens (
+    id INTEGER PRIMARY KEY,
+    chave TEXT UNIQUE,
+    remetente TEXT NOT NULL,
+    destinatarios TEXT NOT NULL,
+    mensagem TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    proxima_tentativa REAL NOT NULL,
+    reservada_em REAL,
+    criada_em REAL NOT NULL,
+    enviada_em REAL,
+    erro TEXT
+);
+CREATE INDEX IF NOT EXISTS mensagens_fila ON mensagens (status, proxima_tentativa);
+"""
+
+
+class Outbox:
+    """
+    Fila durável de e-mails. `enfileirar` só grava no SQLite e retorna; uma thread
+    em segundo plano envia, com espera exponencial entre tentativas. Os envios
+    reservam até `lote` mensagens de uma vez e passam todas pela mesma sessão
+    SMTP autenticada (PoolSMTP), em vez de conectar e fazer login a cada mensagem.
+
+    Cada mensagem passa por pendente -> enviando -> enviada (ou falhou). A `chave`
+    opcional torna o enfileiramento idempotente (a mesma submissão não gera dois
+    e-mails). Uma mensagem presa em "enviando" por mais de `reserva` segundos (processo
+    morto no meio do envio) volta para a fila; a thread confere isso a cada ciclo,
+    não só ao iniciar.
+    """
+
+    def __init__(
+        self,
+        caminho: str = "outbox.db",
+        conectar: Callable[[], smtplib.SMTP] = conectar_gmail,
+        max_tentativas: int = 6,
+        espera_base: float = 2.0,
+        espera_max: float = 300.0,
+        reserva: float = 120.0,
+        lote: int = 50,
+    ):
+        self.caminho = caminho
+        self.conectar = conectar
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.reserva = reserva
+        self.lote = lote
+        self._pool = PoolSMTP(conectar, tamanho=1)
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tarefas: List[Callable[[], None]] = []
+        self._conn = self._abrir()
+        self._conn.executescript(_SCHEMA)
+
+    def _abrir(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --- lado do app
+    def enfileirar(self, remetente: str, destinatarios: List[str], mensagem: str, chave: Optional[str] = None) -> int:
+        agora = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO mensagens (chave, remetente, destinatarios, mensagem, proxima_tentativa, criada_em)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, remetente, json.dumps(destinatarios), mensagem, agora, agora),
+            )
+            if cur.rowcount:
+                id_ = cur.lastrowid
+            else:
+                id_ = self._conn.execute("SELECT id FROM mensagens WHERE chave = ?", (chave,)).fetchone()[0]
+        self._acordar.set()
+        return id_
+
+    def agendar(self, tarefa: Callable[[], None]) -> None:
+        """roda `tarefa` na thread do outbox a cada ciclo (pelo menos a cada ocioso_max segundos)"""
+        self._tarefas.append(tarefa)
+
+    def contagem(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM mensagens GROUP BY status").fetchall())
+
+    # --- lado do worker
+    def _reservar(self, conn: sqlite3.Connection) -> List[tuple]:
+        agora = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            linhas = conn.execute(
+                "SELECT id, remetente, destinatarios, mensagem, tentativas FROM mensagens"
+                " WHERE status = 'pendente' AND proxima_tentativa <= ? ORDER BY id LIMIT ?",
+                (agora, self.lote),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE mensagens SET status = 'enviando', reservada_em = ? WHERE id = ?",
+                [(agora, linha[0]) for linha in linhas],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return linhas
+
+    def _devolver_reservas(self, conn: sqlite3.Connection) -> int:
+        """reservas vencidas (processo morto no meio do envio) voltam para 'pendente'"""
+        return conn.execute(
+            "UPDATE mensagens SET status = 'pendente' WHERE status = 'enviando' AND reservada_em < ?",
+            (time.time() - self.reserva,),
+        ).rowcount
+
+    def _registrar_falha(self, conn: sqlite3.Connection, id_: int, tentativas: int, erro: Exception) -> None:
+        tentativas += 1
+        if _permanente(erro) or tentativas >= self.max_tentativas:
+            conn.execute(
+                "UPDATE mensagens SET status = 'falhou', tentativas = ?, erro = ? WHERE id = ?",
+                (tentativas, repr(erro), id_),
+            )
+            return
+        espera = min(self.espera_max, self.espera_base * 2 ** (tentativas - 1))
+        conn.execute(
+            "UPDATE mensagens SET status = 'pendente', tentativas = ?, proxima_tentativa = ?, erro = ? WHERE id = ?",
+            (tentativas, time.time() + espera, repr(erro), id_),
+        )
+
+    def processar_pendentes(self, conn: Optional[sqlite3.Connection] = None) -> int:
+        """envia tudo que está vencido na fila; retorna quantas foram enviadas"""
+        if conn is None:
+            conn = self._abrir()
+            try:
+                return self.processar_pendentes(conn)
+            finally:
+                conn.close()
+        enviadas = 0
+        while not self._parar.is_set():
+            linhas = self._reservar(conn)
+            if not linhas:
+                break
+            for i, (id_, remetente, destinatarios, mensagem, tentativas) in enumerate(linhas):
+                if self._parar.is_set():
+                    # devolve o resto do lote para a fila
+                    conn.executemany(
+                        "UPDATE mensagens SET status = 'pendente' WHERE id = ?", [(l[0],) for l in linhas[i:]]
+                    )
+                    break
+                try:
+                    self._pool.enviar(remetente, json.loads(destinatarios), mensagem)
+                except (smtplib.SMTPException, OSError, RuntimeError, ValueError) as erro:
+                    self._registrar_falha(conn, id_, tentativas, erro)
+                    continue
+                conn.execute(
+                    "UPDATE mensagens SET status = 'enviada', enviada_em = ?, erro = NULL WHERE id = ?",
+                    (time.time(), id_),
+                )
+                enviadas += 1
+        return enviadas
+
+    def _proxima_espera(self, conn: sqlite3.Connection) -> float:
+        """até a próxima tentativa vencida ou a próxima reserva que vai vencer"""
+        linha = conn.execute(
+            "SELECT MIN(CASE status WHEN 'pendente' THEN proxima_tentativa ELSE reservada_em + ? END)"
+            " FROM mensagens WHERE status IN ('pendente', 'enviando')",
+            (self.reserva,),
+        ).fetchone()
+        if linha[0] is None:
+            return self.espera_max
+        return max(0.0, linha[0] - time.time())
+
+    def _loop(self) -> None:
+        conn = self._abrir()
+        while not self._parar.is_set():
+            self._acordar.clear()
+            for tarefa in self._tarefas:
+                try:
+                    tarefa()
+                except Exception as erro:
+                    print(f"Outbox: tarefa agendada falhou ({erro!r}).")
+            try:
+                self._devolver_reservas(conn)
+                self.processar_pendentes(conn)
+                espera = self._proxima_espera(conn)
+            except Exception as erro:
+                # a thread não pode morrer: o que ficou reservado volta pela reserva vencida
+                print(f"Outbox: erro no envio ({erro!r}), tentando de novo.")
+                espera = self.espera_base
+            # a sessão fica aberta para o próximo envio, mas não além de ocioso_max
+            self._pool.fechar_ociosas(self._pool.ocioso_max)
+            self._acordar.wait(min(espera, self._pool.ocioso_max))
+        self._pool.fechar()
+        conn.close()
+
+    def iniciar(self) -> "Outbox":
+        if self._thread and self._thread.is_alive():
+            return self
+        with self._lock:
+            self._devolver_reservas(self._conn)
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="outbox-email", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._pool.fechar()
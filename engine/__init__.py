@@ -0,0 +1,21 @@
+# ======= motor de cálculo da atividade (versões vetorizadas) =======
+from engine.batch import (
+    LOCAIS,
+    MARKETINGS,
+    RECEBIMENTOS,
+    PAGAMENTOS,
+    ResultadoLote,
+    acumular_caixa,
+    codificar_decisoes,
+    simular_lote,
+    tabela_demanda,
+)
+from engine.solver import Decisao, melhores_decisoes
+from engine.dre import DRE, calcular_dre
+from engine.centavos import ParamsCentavos, simular_lote_centavos
+from engine.estoque import CUSTEIOS, custear
+from engine.plano import Plano, planejar_compras
+from engine.montecarlo import Incerteza, ResultadoMonteCarlo, simular_monte_carlo
+from engine.varredura import Varredura, varrer
+from engine.sensibilidade import RelatorioSensibilidade, Sensibilidade, analisar_sensibilidade
+from engine.registro import REGISTRO, carregar, dtype_registro, registrar, salvar
@@ -0,0 +1,306 @@
+# ======= motor vetorizado: avalia muitas decisões de uma vez =======
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from email_helper import (
+    CAMPOS_DEMANDA,
+    INICIO_PAGAMENTO,
+    Params,
+    calcular_demanda,
+    norm,
+    nucleo_pagamento,
+    nucleo_recebimento,
+)
+from engine.estoque import custear
+
+# ---------------------------
+# Códigos das escolhas (posição na tupla = código inteiro)
+# ---------------------------
+LOCAIS = ("serra", "praiadocanto")
+MARKETINGS = ("conservador", "agressivo")
+RECEBIMENTOS = ("avista", "cartao", "boleto")
+PAGAMENTOS = ("avista", "parcelado", "adiantado")
+
+# rótulos como aparecem no app
+ROTULOS_LOCAL = ("Serra", "Praia do Canto")
+ROTULOS_MARKETING = ("Conservador", "Agressivo")
+ROTULOS_RECEBIMENTO = ("À vista", "Cartão", "Boleto")
+ROTULOS_PAGAMENTO = ("À vista", "Parcelado", "Adiantado")
+
+MESES = 3
+
+
+@lru_cache(maxsize=256)
+def _codigo(valor: str, opcoes: Tuple[str, ...]) -> int:
+    v = norm(valor)
+    if v not in opcoes:
+        raise ValueError(f"opção desconhecida: {valor!r} (esperado um de {opcoes})")
+    return opcoes.index(v)
+
+
+def codificar_decisao(decisao: tuple) -> Tuple[int, ...]:
+    """(local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3) -> tupla só de inteiros"""
+    loc, mkt, rec, q1, q2, q3, p1, p2, p3 = decisao
+    return (
+        _codigo(loc, LOCAIS),
+        _codigo(mkt, MARKETINGS),
+        _codigo(rec, RECEBIMENTOS),
+        int(q1),
+        int(q2),
+        int(q3),
+        _codigo(p1, PAGAMENTOS),
+        _codigo(p2, PAGAMENTOS),
+        _codigo(p3, PAGAMENTOS),
+    )
+
+
+def codificar_decisoes(decisoes: Sequence[tuple]) -> Tuple[np.ndarray, ...]:
+    """converte tuplas (local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3)
+    em arrays de códigos prontos para simular_lote"""
+    cod = np.array([codificar_decisao(d) for d in decisoes], dtype=np.int64).reshape(-1, 3 + 2 * MESES)
+    local, marketing, recebimento = (cod[:, i].astype(np.intp) for i in range(3))
+    qnt = cod[:, 3:3 + MESES]
+    pag = cod[:, 3 + MESES:].astype(np.intp)
+    return local, marketing, recebimento, qnt, pag
+
+
+def tabela_demanda(meses: int = MESES, params: Optional[Params] = None) -> np.ndarray:
+    """demanda por mês para cada combinação (local, marketing, recebimento), via calcular_demanda"""
+    p = params or Params()
+    return _tabela_demanda(meses, tuple(getattr(p, c) for c in CAMPOS_DEMANDA))
+
+
+@lru_cache(maxsize=16)
+def _tabela_demanda(meses: int, demanda: Tuple[float, ...]) -> np.ndarray:
+    # em cache só pelos campos de demanda: os outros campos de Params não mudam a tabela
+    p = Params(**dict(zip(CAMPOS_DEMANDA, demanda)))
+    tab = np.zeros((len(LOCAIS), len(MARKETINGS), len(RECEBIMENTOS), meses), dtype=np.int64)
+    for i, loc in enumerate(LOCAIS):
+        for j, mkt in enumerate(MARKETINGS):
+            for k, rec in enumerate(RECEBIMENTOS):
+                tab[i, j, k] = calcular_demanda(loc, mkt, rec, meses, p)
+    tab.flags.writeable = False
+    return tab
+
+
+@dataclass
+class ResultadoLote:
+    """arrays (n, meses) por mês para cada decisão avaliada"""
+    demanda: np.ndarray
+    saldo: np.ndarray  # pacotes em estoque no fim do mês
+    venda: np.ndarray
+    receita: np.ndarray
+    cmv: np.ndarray
+    pagamentos: np.ndarray
+    fc: np.ndarray
+    caixa: np.ndarray
+    despfin: np.ndarray  # negativa, como em generate_email_body
+    # linhas da DRE
+    aluguel: np.ndarray
+    deprec: np.ndarray
+    despmkt: np.ndarray
+    despcartao: np.ndarray
+    despinad: np.ndarray  # perda com inadimplência do boleto
+    lucro: np.ndarray
+
+    @property
+    def lucro_trimestre(self) -> np.ndarray:
+        return self.lucro.sum(axis=1)
+
+
+# ---------------------------
+# Núcleo vetorizado (espelha generate_email_body, para qualquer número de meses)
+# ---------------------------
+def _espalhar(valores: np.ndarray, nucleos: np.ndarray, codigos: np.ndarray, inicio: int = 0) -> np.ndarray:
+    """
+    Convolução mês a mês (versão em lote de email_helper.espalhar):
+    saida[k + inicio + j] += valores[k] * nucleos[codigos[k], j], descartando o que sai do horizonte.
+    valores: (meses, n); nucleos: (políticas, defasagens); codigos: (n,) ou (meses, n).
+    """
+    meses = len(valores)
+    saida = np.zeros(valores.shape, dtype=np.float64)
+    for j in range(nucleos.shape[1]):
+        d = inicio + j
+        coluna = nucleos[:, j]
+        if abs(d) >= meses or not coluna.any():
+            continue
+        # só os meses de origem que caem dentro do horizonte
+        origem = slice(0, meses - d) if d >= 0 else slice(-d, meses)
+        destino = slice(d, meses) if d >= 0 else slice(0, meses + d)
+        cod = codigos[origem] if codigos.ndim == 2 else codigos
+        saida[destino] += valores[origem] * coluna[cod]
+    return saida
+
+
+def acumular_caixa(fc: np.ndarray, capital: float, taxaesp: float, bloco: int = 1 << 14) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Saldo de caixa com cheque especial, mês a mês, para muitos cenários:
+    caixa[i] = caixa[i-1] + fc[i], e se ficar negativo despfin[i] = caixa[i]·taxaesp
+    (negativa) entra no próprio saldo. fc é (meses, n); devolve (caixa, despfin).
+
+    A recorrência é sequencial no tempo, então o laço anda pelos meses e cada passo
+    opera sobre um bloco de cenários, escrevendo direto nas linhas de saída (sem
+    temporários); blocos de `bloco` cenários mantêm o saldo anterior no cache.
+    """
+    meses, n = fc.shape
+    caixa = np.empty_like(fc, dtype=np.float64)
+    despfin = np.empty_like(caixa)
+    for a in range(0, n, bloco):
+        b = min(n, a + bloco)
+        anterior = np.full(b - a, float(capital))
+        for i in range(meses):
+            c, d = caixa[i, a:b], despfin[i, a:b]
+            np.add(anterior, fc[i, a:b], out=c)
+            np.minimum(c, 0.0, out=d)
+            d *= taxaesp
+            c += d
+            anterior = c
+    return caixa, despfin
+
+
+def _preparar(local, marketing, recebimento, qnt, pag) -> Tuple[np.ndarray, ...]:
+    """códigos como intp; qnt e pag transpostos para (mês, n), contíguos por mês"""
+    return (
+        np.asarray(local, dtype=np.intp),
+        np.asarray(marketing, dtype=np.intp),
+        np.asarray(recebimento, dtype=np.intp),
+        np.ascontiguousarray(np.asarray(qnt, dtype=np.int64).T),
+        np.ascontiguousarray(np.asarray(pag, dtype=np.intp).T),
+    )
+
+
+def _vendas(local, marketing, recebimento, q: np.ndarray, demanda: Optional[np.ndarray] = None,
+            params: Optional[Params] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """demanda (a de calcular_demanda, se não for dada), estoque final (saldo) e venda por mês, todos (mês, n)"""
+    meses, n = q.shape
+    if demanda is None:
+        combinacao = (local * len(MARKETINGS) + marketing) * len(RECEBIMENTOS) + recebimento
+        demanda = np.ascontiguousarray(tabela_demanda(meses, params).reshape(-1, meses).T)[:, combinacao]
+    saldo = np.empty_like(q)
+    venda = np.empty_like(q)
+    anterior = np.zeros(n, dtype=np.int64)
+    for i in range(meses):
+        disponivel = anterior + q[i]
+        np.maximum(disponivel - demanda[i], 0, out=saldo[i])
+        np.minimum(disponivel, demanda[i], out=venda[i])
+        anterior = saldo[i]
+    return demanda, saldo, venda
+
+
+def simular_lote(
+    local: np.ndarray,
+    marketing: np.ndarray,
+    recebimento: np.ndarray,
+    qnt: np.ndarray,
+    pag: np.ndarray,
+    params: Optional[Params] = None,
+    custeio: str = "r",
+    demanda: Optional[np.ndarray] = None,
+    taxainad: Optional[np.ndarray] = None,
+) -> ResultadoLote:
+    """
+    Avalia n decisões de uma vez.
+    local, marketing, recebimento: códigos (n,) conforme LOCAIS, MARKETINGS, RECEBIMENTOS.
+    qnt: quantidades compradas (n, meses); pag: códigos (n, meses) conforme PAGAMENTOS.
+
+    O horizonte é qnt.shape[1] (3 na atividade). Com mais meses as regras seguem
+    as mesmas: demanda no patamar do 3º mês, móveis em 3 parcelas, boleto em 3x
+    (meses +1, +2, +3), parcelado do fornecedor nos meses k, k+1, k+2, adiantado
+    pago no mês anterior. A compra parcelada do mês 1 paga as 3 parcelas um mês
+    depois (meses 2, 3 e 4); no trimestre isso é o mesmo que a regra do R, em que
+    a parcela do mês 1 não entra no caixa.
+    custeio: "r" (fórmula do R, padrão), "media" ou "peps"; ver engine.estoque.custear.
+    demanda (n, meses) e taxainad (n,) substituem, por cenário, a demanda de
+    calcular_demanda e p.taxainad (usados pelo engine.montecarlo).
+    """
+    p = params or Params()
+    # internamente tudo é (mês, n), contíguo por mês; a saída volta como (n, mês)
+    local, marketing, recebimento, q, pag = _preparar(local, marketing, recebimento, qnt, pag)
+    meses, n = q.shape
+    qf = q.astype(np.float64)
+
+    # --- Demanda, saldo, venda, receita
+    if demanda is not None:
+        demanda = np.ascontiguousarray(np.asarray(demanda, dtype=np.int64).T)
+    demanda, saldo, venda = _vendas(local, marketing, recebimento, q, demanda, p)
+    receita = venda * float(p.pv)
+
+    # --- Custos unitários (+ transporte), compras, estoques, CMV
+    unit = (p.pc * np.array([1.0, p.jurcomp, p.descomp]) + p.transp)[pag]
+    estoque, cmv = custear(q, unit, saldo, custeio)
+
+    # --- Recebimentos e pagamentos: núcleos de defasagem de email_helper, um por código
+    vc, vb, tc = p.vendacart, p.vendaboleto, p.taxacart
+    if taxainad is None:
+        nuc_receb = np.array([nucleo_recebimento(p, r) for r in RECEBIMENTOS])
+        receb = _espalhar(receita, nuc_receb, recebimento)
+        ti = p.taxainad
+    else:
+        # os núcleos são lineares na inadimplência: sem perda menos a perda de cada cenário
+        ti = np.asarray(taxainad, dtype=np.float64)
+        nuc_receb = np.array([nucleo_recebimento(replace(p, taxainad=0.0), r) for r in RECEBIMENTOS])
+        nuc_perda = nuc_receb - np.array([nucleo_recebimento(replace(p, taxainad=1.0), r) for r in RECEBIMENTOS])
+        receb = _espalhar(receita, nuc_receb, recebimento)
+        receb -= _espalhar(receita * ti, nuc_perda, recebimento)
+
+    # compra parcelada do mês 1: vira uma 4ª política, usada só no mês 1, com as
+    # parcelas um mês depois (no trimestre, a réplica do R)
+    parcelado = PAGAMENTOS.index("parcelado")
+    primeira = [0.0] + nucleo_pagamento(p, "parcelado")
+    nucleos = [nucleo_pagamento(p, c) for c in PAGAMENTOS] + [primeira]
+    nuc_pag = np.array([k + [0.0] * (len(primeira) - len(k)) for k in nucleos])
+    cod_pag = pag.copy()
+    cod_pag[0][cod_pag[0] == parcelado] = len(PAGAMENTOS)
+    pagamentos = _espalhar(qf, nuc_pag, cod_pag, INICIO_PAGAMENTO)
+    pagamentos += qf * p.transp
+
+    # --- FC (aluguel + parcela dos móveis, marketing, recebimentos, pagamentos)
+    aluguel_local = np.array([-p.alserra, -p.alpraia])[local]
+    moveis = np.array([-(p.movserra / 3), -(p.movpraia / 3)])[local]
+    fixo = np.empty_like(receb)
+    fixo[:] = aluguel_local
+    fixo[:3] += moveis
+    fixo -= p.despmktfx
+    fixo[0] -= np.array([0.0, p.despmktadc])[marketing]
+    fc = fixo
+    fc += receb
+    fc -= pagamentos
+
+    # --- Cheque especial e desp. financeira
+    caixa, despfin = acumular_caixa(fc, p.capital, p.taxaesp)
+
+    # --- DRE (competência): despesas do mês e lucro
+    aluguel = np.array([p.alserra, p.alpraia], dtype=np.float64)[local]
+    deprec = np.array([p.movserra / p.vuserra, p.movpraia / p.vupraia])[local]
+    despmkt = np.empty_like(receita)
+    despmkt[:] = float(p.despmktfx)
+    despmkt[0] += np.array([0.0, p.despmktadc])[marketing]
+    despcartao = receita * np.array([0.0, vc * tc, vc * tc])[recebimento]
+    despinad = receita * (np.array([0.0, 0.0, vb])[recebimento] * ti)
+    lucro = receita - cmv
+    lucro -= aluguel + deprec
+    lucro -= despmkt
+    lucro -= despcartao
+    lucro -= despinad
+    lucro += despfin
+
+    return ResultadoLote(
+        demanda=demanda.T,
+        saldo=saldo.T,
+        venda=venda.T,
+        receita=receita.T,
+        cmv=cmv.T,
+        pagamentos=pagamentos.T,
+        fc=fc.T,
+        caixa=caixa.T,
+        despfin=despfin.T,
+        aluguel=np.broadcast_to(aluguel[:, None], (n, meses)),
+        deprec=np.broadcast_to(deprec[:, None], (n, meses)),
+        despmkt=despmkt.T,
+        despcartao=despcartao.T,
+        despinad=despinad.T,
+        lucro=lucro.T,
+    )
@@ -0,0 +1,245 @@
+# ======= motor em centavos inteiros (int64) =======
+"""
+Mesma simulação de engine.batch.simular_lote, mas com todo valor monetário em
+centavos int64 e as taxas em partes por milhão (ppm), para que os resultados
+sejam exatos e reproduzíveis (sem deriva de ponto flutuante escondida pelo fmt).
+
+Regras de arredondamento (sempre ao centavo, metade para longe do zero):
+- jurcomp / descomp: o preço unitário do pacote é arredondado
+  (pc·jurcomp, pc·descomp) e multiplicado pela quantidade;
+- parcelas (fornecedor em 3x, móveis em 3x, boleto em 3x): o total é dividido
+  em 3 partes inteiras e o resto (1 ou 2 centavos) vai na 1ª parcela;
+- vendacart / vendaboleto: a parte no cartão e a parte no boleto de cada mês
+  são arredondadas; o à vista é o que sobra (as três somam a receita);
+- taxacart: arredondada sobre a parte no cartão do mês;
+- taxainad: arredondada sobre cada parcela do boleto;
+- depreciação: móveis / vida útil, arredondada por mês;
+- estoque (custo médio, engine.estoque): arredondado por mês; o CMV é a
+  diferença, então compras = CMV + variação do estoque exatamente (no PEPS
+  os lotes já estão em centavos e não há arredondamento);
+- taxaesp: arredondada sobre o saldo negativo de cada mês.
+"""
+from dataclasses import astuple, dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from email_helper import CAMPOS_DEMANDA, Params
+from engine.batch import (
+    PAGAMENTOS,
+    RECEBIMENTOS,
+    ResultadoLote,
+    _preparar,
+    _vendas,
+)
+from engine.estoque import custear
+
+PPM = 1_000_000
+
+
+def centavos(valor: float) -> int:
+    """reais -> centavos (erro se o valor tiver frações de centavo)"""
+    c = round(valor * 100)
+    if abs(c - valor * 100) > 1e-6:
+        raise ValueError(f"valor com frações de centavo: {valor!r}")
+    return int(c)
+
+
+def ppm(taxa: float) -> int:
+    """taxa -> partes por milhão (erro se precisar de mais de 6 casas)"""
+    t = round(taxa * PPM)
+    if abs(t - taxa * PPM) > 1e-6:
+        raise ValueError(f"taxa com mais de 6 casas decimais: {taxa!r}")
+    return int(t)
+
+
+def reais(valor):
+    """centavos -> reais (float), para exibir"""
+    return np.asarray(valor) / 100 if np.ndim(valor) else valor / 100
+
+
+def _arred(num, den):
+    """num / den (den > 0, inteiro ou array) arredondado ao inteiro, metade para longe do zero"""
+    num = np.asarray(num, dtype=np.int64)
+    q = (2 * np.abs(num) + den) // (2 * den)
+    return np.where(num < 0, -q, q)
+
+
+def _taxa(valor, taxa_ppm: int):
+    """valor (>= 0) · taxa, arredondado ao centavo"""
+    return (np.asarray(valor, dtype=np.int64) * taxa_ppm + PPM // 2) // PPM
+
+
+def _em3(total):
+    """total em 3 parcelas inteiras; o resto vai na 1ª"""
+    total = np.asarray(total, dtype=np.int64)
+    resto = total // 3
+    return total - 2 * resto, resto
+
+
+@dataclass(frozen=True)
+class ParamsCentavos:
+    """Params convertidos: valores em centavos, taxas (e fatias de mercado) em ppm, vidas úteis em meses"""
+    pv: int
+    pc: int
+    descomp: int
+    jurcomp: int
+    transp: int
+    alserra: int
+    alpraia: int
+    movserra: int
+    vuserra: int
+    movpraia: int
+    vupraia: int
+    vendacart: int
+    vendaboleto: int
+    taxacart: int
+    taxainad: int
+    capital: int
+    taxaesp: int
+    despmktfx: int
+    despmktadc: int
+    mercserra1: int
+    mercserra2: int
+    mercserra3: int
+    mercpraia1: int
+    mercpraia2: int
+    mercpraia3: int
+    fatmktcons: int
+    fatmktagr: int
+
+    @classmethod
+    def de(cls, p: Params) -> "ParamsCentavos":
+        taxas = {"descomp", "jurcomp", "vendacart", "vendaboleto", "taxacart", "taxainad", "taxaesp", *CAMPOS_DEMANDA}
+        meses = {"vuserra", "vupraia"}
+        valores = {}
+        for campo, valor in zip(p.__dataclass_fields__, astuple(p)):
+            if campo in taxas:
+                valores[campo] = ppm(valor)
+            elif campo in meses:
+                valores[campo] = int(valor)
+            else:
+                valores[campo] = centavos(valor)
+        return cls(**valores)
+
+
+def _somar_defasado(saida: np.ndarray, valores: np.ndarray, d: int) -> None:
+    """saida[t] += valores[t - d] dentro do horizonte (d pode ser negativo)"""
+    meses = len(saida)
+    if abs(d) >= meses:
+        return
+    if d >= 0:
+        saida[d:] += valores[:meses - d]
+    else:
+        saida[:d] += valores[-d:]
+
+
+def acumular_caixa_centavos(fc: np.ndarray, capital: int, taxaesp_ppm: int) -> Tuple[np.ndarray, np.ndarray]:
+    """versão inteira de engine.batch.acumular_caixa: fc (meses, n) em centavos"""
+    meses, n = fc.shape
+    caixa = np.empty((meses, n), dtype=np.int64)
+    despfin = np.empty_like(caixa)
+    anterior = np.full(n, capital, dtype=np.int64)
+    for i in range(meses):
+        c = caixa[i]
+        np.add(anterior, fc[i], out=c)
+        despfin[i] = -_taxa(-np.minimum(c, 0), taxaesp_ppm)
+        c += despfin[i]
+        anterior = c
+    return caixa, despfin
+
+
+def simular_lote_centavos(
+    local: np.ndarray,
+    marketing: np.ndarray,
+    recebimento: np.ndarray,
+    qnt: np.ndarray,
+    pag: np.ndarray,
+    params: Optional[Params] = None,
+    custeio: str = "r",
+) -> ResultadoLote:
+    """
+    Como engine.batch.simular_lote (mesmos códigos, qualquer horizonte), com todos
+    os campos do resultado em centavos int64. Difere do motor em float por poucos
+    centavos, só pelas regras de arredondamento do módulo.
+    """
+    p = params or Params()
+    c = ParamsCentavos.de(p)
+    local, marketing, recebimento, q, pag = _preparar(local, marketing, recebimento, qnt, pag)
+    meses, n = q.shape
+    demanda, saldo, venda = _vendas(local, marketing, recebimento, q, params=p)
+    receita = venda * c.pv
+
+    # --- Recebimentos: partes no cartão e no boleto arredondadas, à vista é o resto
+    cod_cartao, cod_boleto = RECEBIMENTOS.index("cartao"), RECEBIMENTOS.index("boleto")
+    usa_cartao = (recebimento == cod_cartao) | (recebimento == cod_boleto)
+    cartao = np.where(usa_cartao, _taxa(receita, c.vendacart), 0)
+    boleto = np.where(recebimento == cod_boleto, _taxa(receita, c.vendaboleto), 0)
+    despcartao = _taxa(cartao, c.taxacart)
+    receb = receita - cartao - boleto
+    _somar_defasado(receb, cartao - despcartao, 1)
+    primeira, demais = _em3(boleto)
+    inad1, inad = _taxa(primeira, c.taxainad), _taxa(demais, c.taxainad)
+    despinad = inad1 + 2 * inad
+    _somar_defasado(receb, primeira - inad1, 1)
+    _somar_defasado(receb, demais - inad, 2)
+    _somar_defasado(receb, demais - inad, 3)
+
+    # --- Preço unitário por forma de pagamento, compras, pagamentos ao fornecedor
+    preco = np.array([c.pc, _arred(c.pc * c.jurcomp, PPM), _arred(c.pc * c.descomp, PPM)], dtype=np.int64)
+    fornecedor = preco[pag] * q
+    cod_parc, cod_adiant = PAGAMENTOS.index("parcelado"), PAGAMENTOS.index("adiantado")
+    pagamentos = np.where(pag == PAGAMENTOS.index("avista"), fornecedor, 0) + c.transp * q
+    _somar_defasado(pagamentos, np.where(pag == cod_adiant, fornecedor, 0), -1)  # pago antes
+    parc_primeira, parc_demais = _em3(np.where(pag == cod_parc, fornecedor, 0))
+    # as parcelas da compra do mês 1 vencem um mês depois (no trimestre, a réplica do R)
+    adiada = np.zeros_like(parc_primeira)
+    adiada[0] = parc_primeira[0]
+    demais_adiada = np.zeros_like(parc_demais)
+    demais_adiada[0] = parc_demais[0]
+    parc_primeira[0] = parc_demais[0] = 0
+    _somar_defasado(pagamentos, adiada, 1)
+    _somar_defasado(pagamentos, demais_adiada, 2)
+    _somar_defasado(pagamentos, demais_adiada, 3)
+    pagamentos += parc_primeira
+    _somar_defasado(pagamentos, parc_demais, 1)
+    _somar_defasado(pagamentos, parc_demais, 2)
+
+    # --- Estoque e CMV
+    estoque, cmv = custear(q, preco[pag] + c.transp, saldo, custeio)
+
+    # --- FC: aluguel, móveis em 3x, marketing, recebimentos, pagamentos
+    aluguel = np.array([c.alserra, c.alpraia], dtype=np.int64)[local]
+    mov1, mov = _em3(np.array([c.movserra, c.movpraia], dtype=np.int64))
+    fc = np.empty_like(receb)
+    fc[:] = -aluguel - c.despmktfx
+    fc[0] -= mov1[local]
+    fc[1:3] -= mov[local]
+    fc[0] -= np.array([0, c.despmktadc], dtype=np.int64)[marketing]
+    fc += receb
+    fc -= pagamentos
+    caixa, despfin = acumular_caixa_centavos(fc, c.capital, c.taxaesp)
+
+    # --- DRE
+    deprec = np.array([_arred(c.movserra, c.vuserra), _arred(c.movpraia, c.vupraia)], dtype=np.int64)[local]
+    despmkt = np.full((meses, n), c.despmktfx, dtype=np.int64)
+    despmkt[0] += np.array([0, c.despmktadc], dtype=np.int64)[marketing]
+    lucro = receita - cmv - aluguel - deprec - despmkt - despcartao - despinad + despfin
+
+    return ResultadoLote(
+        demanda=demanda.T,
+        saldo=saldo.T,
+        venda=venda.T,
+        receita=receita.T,
+        cmv=cmv.T,
+        pagamentos=pagamentos.T,
+        fc=fc.T,
+        caixa=caixa.T,
+        despfin=despfin.T,
+        aluguel=np.broadcast_to(aluguel[:, None], (n, meses)),
+        deprec=np.broadcast_to(deprec[:, None], (n, meses)),
+        despmkt=despmkt.T,
+        despcartao=despcartao.T,
+        despinad=despinad.T,
+        lucro=lucro.T,
+    )
@@ -0,0 +1,85 @@
+# ======= DRE do trimestre por decisão, com cache =======
+from dataclasses import astuple, dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from email_helper import Params
+from engine.batch import MESES, codificar_decisao, simular_lote
+from engine.centavos import simular_lote_centavos
+
+Mensal = Tuple[float, float, float]
+
+TAMANHO_CACHE = 4096
+
+
+@dataclass(frozen=True)
+class DRE:
+    """DRE mês a mês (despesas positivas), pacotes vendidos e saldos de caixa no fim de cada mês"""
+    venda: Mensal
+    receita: Mensal
+    cmv: Mensal
+    aluguel: Mensal
+    deprec: Mensal
+    despmkt: Mensal
+    despcartao: Mensal
+    despinad: Mensal
+    despfin: Mensal
+    lucro: Mensal
+    caixa: Mensal
+
+    @property
+    def lucro_bruto(self) -> float:
+        return sum(self.receita) - sum(self.cmv)
+
+    @property
+    def lucro_trimestre(self) -> float:
+        return sum(self.lucro)
+
+
+def calcular_dre(decisao: tuple, params: Optional[Params] = None, centavos: bool = False) -> DRE:
+    """
+    DRE para (local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3).
+    Rótulos equivalentes ("Praia do Canto" / "praiadocanto") caem na mesma entrada do cache.
+    Com centavos=True usa o motor inteiro (engine.centavos): valores exatos ao centavo.
+    """
+    p = params or Params()
+    return _dre(codificar_decisao(decisao), astuple(p), centavos)
+
+
+@lru_cache(maxsize=TAMANHO_CACHE)
+def _dre(codigos: Tuple[int, ...], chave_params: tuple, centavos: bool = False) -> DRE:
+    loc, mkt, rec = codigos[:3]
+    simular = simular_lote_centavos if centavos else simular_lote
+    r = simular(
+        np.array([loc]), np.array([mkt]), np.array([rec]),
+        np.array([codigos[3:3 + MESES]]), np.array([codigos[3 + MESES:]]),
+        Params(*chave_params),
+    )
+    escala = 100 if centavos else 1
+
+    def linha(x: np.ndarray) -> Mensal:
+        return tuple(float(v) / escala for v in x[0])
+
+    return DRE(
+        venda=tuple(float(v) for v in r.venda[0]),
+        receita=linha(r.receita),
+        cmv=linha(r.cmv),
+        aluguel=linha(r.aluguel),
+        deprec=linha(r.deprec),
+        despmkt=linha(r.despmkt),
+        despcartao=linha(r.despcartao),
+        despinad=linha(r.despinad),
+        despfin=linha(-r.despfin),
+        lucro=linha(r.lucro),
+        caixa=linha(r.caixa),
+    )
+
+
+def info_cache():
+    return _dre.cache_info()
+
+
+def limpar_cache() -> None:
+    _dre.cache_clear()
@@ -0,0 +1,74 @@
+# ======= custeio do estoque: réplica do R, custo médio e PEPS =======
+from typing import Tuple
+
+import numpy as np
+
+CUSTEIOS = ("r", "media", "peps")
+
+
+def _media(valor: np.ndarray, base: np.ndarray, saldo: np.ndarray, inteiro: bool) -> np.ndarray:
+    """valor / base · saldo; em centavos arredonda ao inteiro, metade para cima"""
+    if inteiro:
+        return (2 * valor * saldo + base) // (2 * base)
+    return valor / base * saldo
+
+
+def custear(
+    q: np.ndarray,
+    unit: np.ndarray,
+    saldo: np.ndarray,
+    metodo: str = "r",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Estoque final e CMV por mês, arrays (meses, n) como no núcleo de engine.batch.
+    q: quantidades compradas; unit: custo por pacote de cada compra (com transporte);
+    saldo: pacotes em estoque no fim do mês. Arrays inteiros (centavos) dão
+    resultado inteiro.
+
+    - "r": réplica da fórmula do R (custo médio, mas a base de março usa compra2qnt);
+    - "media": custo médio ponderado móvel;
+    - "peps": primeiro a entrar, primeiro a sair. Cada compra é um lote; os lotes
+      ficam em arrays acumulados (quantidade e custo até o lote j), e um ponteiro
+      por cenário marca o lote mais antigo ainda com saldo. O ponteiro só anda para
+      frente, então o custo total é O(meses·n).
+    """
+    if metodo not in CUSTEIOS:
+        raise ValueError(f"custeio desconhecido: {metodo!r} (esperado um de {CUSTEIOS})")
+    inteiro = np.issubdtype(np.asarray(unit).dtype, np.integer)
+    meses, n = q.shape
+    compras = unit * q
+
+    if metodo == "peps":
+        # lotes acumulados: qtd_acum[j + 1] / custo_acum[j + 1] = soma das compras 0..j
+        qtd_acum = np.zeros((meses + 1, n), dtype=q.dtype)
+        custo_acum = np.zeros((meses + 1, n), dtype=compras.dtype)
+        np.cumsum(q, axis=0, out=qtd_acum[1:])
+        np.cumsum(compras, axis=0, out=custo_acum[1:])
+        cenario = np.arange(n)
+        lote = np.zeros(n, dtype=np.intp)  # lote mais antigo ainda em estoque
+        vendido_acum = np.empty_like(compras)
+        for i in range(meses):
+            saiu = qtd_acum[i + 1] - saldo[i]  # pacotes vendidos até o mês i
+            while True:
+                esgotado = (qtd_acum[lote + 1, cenario] <= saiu) & (lote < i)
+                if not esgotado.any():
+                    break
+                lote += esgotado
+            parcial = saiu - qtd_acum[lote, cenario]
+            vendido_acum[i] = custo_acum[lote, cenario] + unit[lote, cenario] * parcial
+        estoque = custo_acum[1:] - vendido_acum
+        cmv = np.diff(vendido_acum, axis=0, prepend=np.zeros((1, n), dtype=compras.dtype))
+        return estoque, cmv
+
+    estoque = np.empty_like(compras)
+    estoque[0] = unit[0] * saldo[0]
+    for i in range(1, meses):
+        # réplica da lógica do R (nota: a fórmula usa compra2qnt na base de março)
+        compra = q[1] if metodo == "r" and i == 2 else q[i]
+        base = saldo[i - 1] + compra
+        divisor = np.maximum(1, base)
+        estoque[i] = np.where(base != 0, _media(estoque[i - 1] + compras[i], divisor, saldo[i], inteiro), 0)
+    cmv = np.empty_like(compras)
+    np.subtract(compras[0], estoque[0], out=cmv[0])
+    cmv[1:] = estoque[:-1] + compras[1:] - estoque[1:]
+    return estoque, cmv
@@ -0,0 +1,141 @@
+# ======= Monte Carlo: incerteza na demanda e na inadimplência =======
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+
+from email_helper import Params
+from engine.batch import MESES, codificar_decisao, simular_lote, tabela_demanda
+
+DEMANDAS = ("fixa", "poisson", "normal", "lognormal")
+INADIMPLENCIAS = ("fixa", "beta")
+PERCENTIS = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+
+@dataclass(frozen=True)
+class Incerteza:
+    """
+    Como sortear cada caminho. A demanda média de cada mês é a de calcular_demanda
+    vezes um fator de mercado do caminho (lognormal de média 1 e coeficiente de
+    variação `cv_mercado`, o mesmo em todos os meses); em volta dessa média:
+    - "poisson": contagem de Poisson;
+    - "normal" / "lognormal": coeficiente de variação `cv_demanda`, arredondada;
+    - "fixa": só o fator de mercado.
+    A taxa de inadimplência do boleto é a de Params ("fixa") ou uma beta por caminho
+    com média p.taxainad e desvio-padrão `dp_inadimplencia` ("beta").
+    """
+    demanda: str = "poisson"
+    cv_demanda: float = 0.15
+    cv_mercado: float = 0.0
+    inadimplencia: str = "beta"
+    dp_inadimplencia: float = 0.05
+
+    def __post_init__(self):
+        if self.demanda not in DEMANDAS:
+            raise ValueError(f"distribuição de demanda desconhecida: {self.demanda!r} (esperado um de {DEMANDAS})")
+        if self.inadimplencia not in INADIMPLENCIAS:
+            raise ValueError(
+                f"distribuição de inadimplência desconhecida: {self.inadimplencia!r} (esperado um de {INADIMPLENCIAS})"
+            )
+
+
+@dataclass
+class ResultadoMonteCarlo:
+    """distribuição do lucro do trimestre de uma decisão em `caminhos` sorteios"""
+    caminhos: int
+    lucro_medio: float
+    lucro_desvio: float
+    percentis: Dict[int, float]  # percentil -> lucro
+    prob_cheque_especial: float  # caminhos com caixa negativo em algum mês
+    prob_prejuizo: float
+    despfin_media: float  # despesa financeira média (positiva)
+    lucros: Optional[np.ndarray] = field(default=None, repr=False)  # um por caminho, se pedido
+
+
+def _lognormal(rng: np.random.Generator, cv: float, tamanho) -> np.ndarray:
+    """fator lognormal de média 1 e coeficiente de variação cv"""
+    if cv <= 0:
+        return np.ones(tamanho)
+    s2 = np.log1p(cv * cv)
+    return rng.lognormal(-s2 / 2, np.sqrt(s2), tamanho)
+
+
+def sortear_demanda(rng: np.random.Generator, media: np.ndarray, n: int, inc: Incerteza) -> np.ndarray:
+    """(n, meses) demandas inteiras a partir da demanda média por mês"""
+    mu = _lognormal(rng, inc.cv_mercado, (n, 1)) * media
+    if inc.demanda == "poisson":
+        return rng.poisson(mu)
+    if inc.demanda == "normal":
+        amostra = rng.normal(mu, inc.cv_demanda * mu)
+    elif inc.demanda == "lognormal":
+        amostra = mu * _lognormal(rng, inc.cv_demanda, mu.shape)
+    else:
+        amostra = mu
+    return np.maximum(np.rint(amostra), 0).astype(np.int64)
+
+
+def sortear_inadimplencia(rng: np.random.Generator, media: float, n: int, inc: Incerteza) -> np.ndarray:
+    """(n,) taxas de inadimplência; a beta tem média `media` e desvio inc.dp_inadimplencia"""
+    dp = inc.dp_inadimplencia
+    if inc.inadimplencia == "fixa" or dp <= 0 or not 0 < media < 1:
+        return np.full(n, float(media))
+    k = media * (1 - media) / (dp * dp) - 1
+    if k <= 0:
+        raise ValueError(f"dp_inadimplencia {dp} grande demais para a média {media}")
+    return rng.beta(media * k, (1 - media) * k, n)
+
+
+def simular_monte_carlo(
+    decisao: tuple,
+    caminhos: int = 1_000_000,
+    params: Optional[Params] = None,
+    incerteza: Optional[Incerteza] = None,
+    semente: int = 0,
+    bloco: int = 100_000,
+    guardar_lucros: bool = False,
+) -> ResultadoMonteCarlo:
+    """
+    Avalia a decisão (local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3)
+    em `caminhos` sorteios de demanda e inadimplência, com simular_lote.
+
+    Os caminhos saem em blocos de `bloco` (a memória dos intermediários é limitada
+    pelo bloco); o bloco i usa o gerador filho i de SeedSequence(semente), então a
+    mesma semente e o mesmo bloco dão sempre o mesmo resultado. Só o lucro de cada
+    caminho (8 bytes) fica guardado até o fim, para os percentis exatos.
+    """
+    p = params or Params()
+    inc = incerteza or Incerteza()
+    cod = codificar_decisao(decisao)
+    loc, mkt, rec = cod[:3]
+    qnt, pag = np.array(cod[3:3 + MESES]), np.array(cod[3 + MESES:])
+    media = tabela_demanda(params=p)[loc, mkt, rec].astype(np.float64)
+
+    lucros = np.empty(caminhos)
+    negativos = 0
+    despfin = 0.0
+    filhos = np.random.SeedSequence(semente).spawn(-(-caminhos // bloco))
+    for i, filho in enumerate(filhos):
+        rng = np.random.default_rng(filho)
+        a, b = i * bloco, min(caminhos, (i + 1) * bloco)
+        n = b - a
+        um = np.ones(n, dtype=np.intp)
+        r = simular_lote(
+            um * loc, um * mkt, um * rec,
+            np.broadcast_to(qnt, (n, MESES)), np.broadcast_to(pag, (n, MESES)), p,
+            demanda=sortear_demanda(rng, media, n, inc),
+            taxainad=sortear_inadimplencia(rng, p.taxainad, n, inc),
+        )
+        lucros[a:b] = r.lucro_trimestre
+        negativos += int((r.despfin < 0).any(axis=1).sum())
+        despfin -= float(r.despfin.sum())
+
+    return ResultadoMonteCarlo(
+        caminhos=caminhos,
+        lucro_medio=float(lucros.mean()),
+        lucro_desvio=float(lucros.std()),
+        percentis=dict(zip(PERCENTIS, (float(v) for v in np.percentile(lucros, PERCENTIS)))),
+        prob_cheque_especial=negativos / caminhos,
+        prob_prejuizo=float((lucros < 0).mean()),
+        despfin_media=despfin / caminhos,
+        lucros=lucros if guardar_lucros else None,
+    )
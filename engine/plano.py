@@ -0,0 +1,304 @@
+# ======= planejamento das compras por programação dinâmica =======
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from email_helper import INICIO_PAGAMENTO, Params, calcular_custos_unitarios, calcular_demanda, nucleo_pagamento, nucleo_recebimento
+from engine.batch import (
+    LOCAIS,
+    MARKETINGS,
+    PAGAMENTOS,
+    RECEBIMENTOS,
+    ROTULOS_LOCAL,
+    ROTULOS_MARKETING,
+    ROTULOS_PAGAMENTO,
+    ROTULOS_RECEBIMENTO,
+    _codigo,
+    simular_lote,
+)
+
+ADIANTADO = PAGAMENTOS.index("adiantado")
+PARCELADO = PAGAMENTOS.index("parcelado")
+
+
+@dataclass
+class Plano:
+    local: str
+    marketing: str
+    recebimento: str
+    qnt: Tuple[int, ...]
+    pag: Tuple[str, ...]
+    lucro: float  # lucro do horizonte inteiro, pelo motor exato (simular_lote)
+    caixa_final: float
+    lucro_pd: float  # lucro previsto pela PD para o plano dela, antes do refinamento
+
+
+@dataclass
+class _Modelo:
+    """coeficientes por mês (t) e forma de pagamento (c) da PD; ver planejar_compras"""
+    demanda: np.ndarray  # (meses,)
+    margem: float  # resultado por pacote vendido (preço menos cartão/inadimplência)
+    custo: np.ndarray  # (3,) custo por pacote comprado, com transporte
+    fixo: np.ndarray  # (meses,) saídas de caixa que não dependem da decisão
+    receb: np.ndarray  # (meses,) quanto de um pacote vendido no mês entra no caixa até o fim do horizonte
+    pagto: np.ndarray  # (meses, 3) quanto de um pacote comprado no mês sai do caixa até o fim do horizonte
+    a_receber: np.ndarray  # (meses,) a receber no fim do mês, por pacote vendido no mês
+    a_receber_antes: np.ndarray  # (meses,) a receber no fim do mês das vendas anteriores (à demanda)
+    a_pagar: np.ndarray  # (meses,) parcelas em aberto no fim do mês, por pacote parcelado no mês
+    a_pagar_antes: np.ndarray  # (meses,) parcela em aberto da compra parcelada do mês anterior (à demanda)
+    adiantamento: np.ndarray  # (meses,) pago no mês pela compra adiantada do mês seguinte, por pacote
+    taxaesp: float
+    capital: float
+
+
+def _modelo(p: Params, loc: int, mkt: int, rec: int, meses: int) -> _Modelo:
+    demanda = np.array(calcular_demanda(LOCAIS[loc], MARKETINGS[mkt], RECEBIMENTOS[rec], meses, p), dtype=np.int64)
+    vc, vb, tc, ti = p.vendacart, p.vendaboleto, p.taxacart, p.taxainad
+    margem = p.pv * (1 - (0.0, vc * tc, vc * tc + vb * ti)[rec])
+    custo = np.array(calcular_custos_unitarios(p, *PAGAMENTOS)) + p.transp
+
+    fixo = np.full(meses, -(p.alserra, p.alpraia)[loc] - p.despmktfx, dtype=np.float64)
+    fixo[:3] -= (p.movserra / 3, p.movpraia / 3)[loc]
+    fixo[0] -= (0.0, p.despmktadc)[mkt]
+
+    # núcleos de email_helper: recebimento nas defasagens 0..3, pagamento em -1..2;
+    # o que cai fora do horizonte nunca entra nem sai (como em simular_lote)
+    kr = p.pv * np.array(nucleo_recebimento(p, RECEBIMENTOS[rec]))
+    kp = np.array([nucleo_pagamento(p, c) for c in PAGAMENTOS])
+    lag_r = np.arange(len(kr))
+    lag_p = np.arange(kp.shape[1]) + INICIO_PAGAMENTO
+    t = np.arange(meses)[:, None]
+    receb = (kr * (t + lag_r < meses)).sum(axis=1)
+    pagto = (kp[None] * ((t + lag_p >= 0) & (t + lag_p < meses))[:, None, :]).sum(axis=2) + p.transp
+    # compra parcelada do mês 1 (como em simular_lote): parcelas um mês depois
+    lag_p1 = lag_p + 1
+    pagto[0, PARCELADO] = (kp[PARCELADO] * ((lag_p1 >= 0) & (lag_p1 < meses))).sum() + p.transp
+
+    # saldos em aberto no fim do mês t: vendas e compras do mês t - j ainda por liquidar
+    a_receber_j = [(kr * (lag_r > j) * (t - j + lag_r < meses)).sum(axis=1) for j in range(len(kr))]
+    a_receber_antes = np.zeros(meses)
+    for j in range(1, min(len(kr), meses)):
+        a_receber_antes[j:] += demanda[:meses - j] * a_receber_j[j][j:]
+    parcela = kp[PARCELADO]
+    a_pagar = (parcela * (lag_p > 0) * (t + lag_p < meses)).sum(axis=1)
+    a_pagar[0] = (parcela * (lag_p1 > 0) * (lag_p1 < meses)).sum()
+    a_pagar_antes = np.zeros(meses)
+    a_pagar_antes[1:] = demanda[:-1] * (parcela * (lag_p > 1) * (t[1:] - 1 + lag_p < meses)).sum(axis=1)
+    if meses > 1:
+        a_pagar_antes[1] = demanda[0] * (parcela * (lag_p1 > 1) * (lag_p1 < meses)).sum()
+    adiantamento = np.where(t[:, 0] + 1 < meses, kp[ADIANTADO, 0], 0.0)
+    return _Modelo(
+        demanda, margem, custo, fixo, receb, pagto, a_receber_j[0], a_receber_antes,
+        a_pagar, a_pagar_antes, adiantamento, p.taxaesp, p.capital,
+    )
+
+
+# estados de pagamento: (mês anterior parcelado?, mês já adiantado?) -> 0..3
+_ESTADOS = ((0, 0), (0, 1), (1, 0), (1, 1))
+
+
+def _acoes(t: int, adiantado: int, meses: int):
+    """(forma de pagamento, adiantar o mês seguinte?) possíveis no mês t"""
+    formas = (ADIANTADO,) if adiantado else tuple(c for c in range(len(PAGAMENTOS)) if c != ADIANTADO)
+    proximos = (0, 1) if t + 1 < meses else (0,)
+    return [(c, a) for c in formas for a in proximos]
+
+
+def _passo(m: _Modelo, t: int, estado: int, c: int, adiantar: int, venda, q, sobra, posicao):
+    """resultado do mês e posição de caixa seguinte"""
+    anterior, _ = _ESTADOS[estado]
+    posicao = posicao + m.fixo[t] + m.receb[t] * venda - m.pagto[t, c] * q
+    caixa = posicao - m.a_receber[t] * venda - m.a_receber_antes[t]
+    if c == PARCELADO:
+        caixa = caixa + m.a_pagar[t] * q
+    if anterior:
+        caixa = caixa + m.a_pagar_antes[t]
+    if adiantar:
+        # o mês seguinte, adiantado, compra o que faltar para a demanda (_quantidades)
+        caixa = caixa - m.adiantamento[t] * np.maximum(m.demanda[t + 1] - sobra, 0)
+    despfin = m.taxaesp * np.minimum(caixa, 0.0)
+    return m.margem * venda - m.custo[c] * q + despfin, posicao + despfin
+
+
+def _quantidades(d: int, estoque, adiantado: int, estoque_max: int, falta_max: int):
+    """
+    Compras possíveis (no eixo 1) para cada estoque inicial: de `falta_max` pacotes
+    abaixo da demanda até sobrar `estoque_max`; num mês adiantado, exatamente o que
+    falta para a demanda (a quantidade paga no mês anterior). Devolve (q, venda, sobra).
+    """
+    estoque = np.asarray(estoque).reshape(-1, 1, 1)
+    if adiantado:
+        q = np.maximum(d - estoque, 0)
+    else:
+        q = np.maximum(d - estoque - falta_max + np.arange(estoque_max + falta_max + 1)[None, :, None], 0)
+    venda = np.minimum(estoque + q, d)
+    return q, venda, estoque + q - venda
+
+
+def _interpolar(v: np.ndarray, lo: float, passo: float, estoque, posicao) -> np.ndarray:
+    """v[estoque, posição] com interpolação linear na posição (extrapola fora da grade)"""
+    faixas = v.shape[1]
+    x = (posicao - lo) / passo
+    i = np.clip(np.floor(x), 0, faixas - 2).astype(np.intp)
+    w = x - i
+    base = estoque * faixas + i
+    plano = v.ravel()
+    return plano[base] * (1 - w) + plano[base + 1] * w
+
+
+def _grades(m: _Modelo, estoque_max: int, faixas: int) -> List[Tuple[float, float]]:
+    """(lo, passo) da grade de posição de caixa no fim de cada mês, por limites sem juros"""
+    entra = np.cumsum(m.fixo + m.receb * m.demanda)
+    sai = np.cumsum(m.fixo - m.pagto.max(axis=1) * (m.demanda + estoque_max))
+    return [(m.capital + lo, max(hi - lo, 1.0) / (faixas - 1)) for lo, hi in zip(sai, entra)]
+
+
+def _valores(m: _Modelo, estoque_max: int, falta_max: int, faixas: int) -> Tuple[List[np.ndarray], List[Tuple[float, float]]]:
+    """
+    Indução para trás: v[t][e, s, b] é o melhor resultado dos meses t.. no estado de
+    pagamento e, com s pacotes em estoque e posição de caixa no ponto b da grade do
+    mês t - 1.
+    """
+    meses = len(m.demanda)
+    grades = _grades(m, estoque_max, faixas)
+    estoque = np.arange(estoque_max + 1)
+    futuro = np.zeros((len(_ESTADOS), estoque_max + 1, faixas))  # estoque que sobra no fim não vale nada
+    valores: List[np.ndarray] = [None] * (meses + 1)
+    valores[meses] = futuro
+    for t in range(meses - 1, -1, -1):
+        if t == 0:
+            posicao = np.array([m.capital])
+        else:
+            lo, passo = grades[t - 1]
+            posicao = lo + passo * np.arange(faixas)
+        d = int(m.demanda[t])
+        melhor = np.full((len(_ESTADOS), estoque_max + 1, len(posicao)), -np.inf)
+        lo, passo = grades[t]
+        for e, (_, adiantado) in enumerate(_ESTADOS):
+            if t == 0 and (adiantado or e):
+                continue  # o mês 1 começa sem parcela anterior nem adiantamento
+            q, venda, sobra = _quantidades(d, estoque, adiantado, estoque_max, falta_max)
+            fora = np.broadcast_to(sobra > estoque_max, (estoque_max + 1, q.shape[1], len(posicao)))
+            sobra = np.minimum(sobra, estoque_max)
+            for c, adiantar in _acoes(t, adiantado, meses):
+                resultado, seguinte = _passo(m, t, e, c, adiantar, venda, q, sobra, posicao[None, None, :])
+                proximo = _ESTADOS.index((int(c == PARCELADO), adiantar))
+                total = resultado + _interpolar(futuro[proximo], lo, passo, sobra, seguinte)
+                total[fora] = -np.inf
+                np.maximum(melhor[e], total.max(axis=1), out=melhor[e])
+        valores[t] = futuro = melhor
+    return valores, grades
+
+
+def _seguir(m: _Modelo, valores, grades, estoque_max: int, falta_max: int) -> Tuple[np.ndarray, np.ndarray, float]:
+    """refaz o caminho ótimo para frente, com a posição de caixa exata (sem arredondar na grade)"""
+    meses = len(m.demanda)
+    qnt = np.zeros(meses, dtype=np.int64)
+    pag = np.zeros(meses, dtype=np.intp)
+    s, e, posicao, total = 0, 0, m.capital, 0.0
+    for t in range(meses):
+        q, venda, sobra = _quantidades(int(m.demanda[t]), s, _ESTADOS[e][1], estoque_max, falta_max)
+        q, venda, sobra = (np.ravel(x) for x in np.broadcast_arrays(q, venda, sobra))
+        cabe = sobra <= estoque_max
+        q, venda, sobra = q[cabe], venda[cabe], sobra[cabe]
+        lo, passo = grades[t]
+        melhor = (-np.inf,)
+        for c, adiantar in _acoes(t, _ESTADOS[e][1], meses):
+            resultado, seguinte = _passo(m, t, e, c, adiantar, venda, q, sobra, posicao)
+            proximo = _ESTADOS.index((int(c == PARCELADO), adiantar))
+            valor = resultado + _interpolar(valores[t + 1][proximo], lo, passo, sobra, seguinte)
+            i = int(np.argmax(valor))
+            if valor[i] > melhor[0]:
+                melhor = (valor[i], c, i, proximo, resultado[i], seguinte[i])
+        _, pag[t], i, e, resultado, posicao = melhor
+        qnt[t], s = q[i], int(sobra[i])
+        total += resultado
+    return qnt, pag, total
+
+
+def _refinar(loc: int, mkt: int, rec: int, qnt: np.ndarray, pag: np.ndarray, p: Params,
+             raio: int, custeio: str, passos: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Busca local com o motor exato: a cada passo avalia, num único simular_lote, todas
+    as trocas de (quantidade, pagamento) de um mês por vez e aplica a melhor.
+    """
+    meses = len(qnt)
+    deltas = np.arange(-raio, raio + 1)
+    mes = np.repeat(np.arange(meses), len(PAGAMENTOS) * len(deltas))
+    forma = np.tile(np.repeat(np.arange(len(PAGAMENTOS)), len(deltas)), meses)
+    delta = np.tile(deltas, meses * len(PAGAMENTOS))
+    validos = ~((mes == 0) & (forma == ADIANTADO))
+    mes, forma, delta = mes[validos], forma[validos], delta[validos]
+    n = len(mes)
+    um = np.ones(n, dtype=np.intp)
+    atual = simular_lote(um[:1] * loc, um[:1] * mkt, um[:1] * rec, qnt[None], pag[None], p, custeio).lucro_trimestre[0]
+    for _ in range(passos):
+        qs = np.repeat(qnt[None], n, axis=0)
+        ps = np.repeat(pag[None], n, axis=0)
+        qs[np.arange(n), mes] = np.maximum(qnt[mes] + delta, 0)
+        ps[np.arange(n), mes] = forma
+        lucro = simular_lote(um * loc, um * mkt, um * rec, qs, ps, p, custeio).lucro_trimestre
+        i = int(np.argmax(lucro))
+        if lucro[i] <= atual + 1e-6:
+            break
+        qnt, pag, atual = qs[i], ps[i], lucro[i]
+    return qnt, pag
+
+
+def planejar_compras(
+    local: str,
+    marketing: str,
+    recebimento: str,
+    meses: int = 36,
+    params: Optional[Params] = None,
+    estoque_max: int = 30,
+    falta_max: int = 0,
+    faixas: int = 128,
+    refinar: bool = True,
+    raio: int = 5,
+    custeio: str = "media",
+) -> Plano:
+    """
+    Quantidades e formas de pagamento mês a mês que maximizam o lucro do horizonte,
+    para local, marketing e recebimento fixos.
+
+    Programação dinâmica sobre (mês, estoque carregado, faixa de caixa), com a
+    demanda de calcular_demanda, os custos de calcular_custos_unitarios e os prazos
+    dos núcleos de recebimento/pagamento. A faixa é a posição de caixa (caixa +
+    a receber − a pagar), que evolui sem depender das decisões passadas; o estado
+    guarda ainda se o mês anterior foi parcelado e se o mês já foi adiantado (um mês
+    adiantado compra exatamente o que falta para a demanda). Os juros do cheque
+    especial usam o caixa estimado a partir da posição, com as vendas e compras
+    anteriores à demanda, e o valor entre faixas é interpolado; por isso o plano da
+    PD é refinado com o motor exato (`refinar`): busca local trocando um mês por vez,
+    até `raio` pacotes para cada lado.
+
+    Compras de `falta_max` pacotes abaixo da demanda até sobrar `estoque_max`; o
+    estoque que sobra no fim vale zero. A compra parcelada do mês 1 paga as parcelas
+    um mês depois; no trimestre a última cai fora do horizonte (réplica do R), o que
+    favorece estocar no mês 1, e `estoque_max` limita esse efeito.
+    O lucro final usa `custeio` "media": a fórmula do R superestima o estoque que
+    sobra em março e o plano passaria a explorar isso.
+    Custo ~ meses · estoque_max² · faixas: 36 meses em 1-2 s.
+    """
+    p = params or Params()
+    loc, mkt, rec = _codigo(local, LOCAIS), _codigo(marketing, MARKETINGS), _codigo(recebimento, RECEBIMENTOS)
+    m = _modelo(p, loc, mkt, rec, meses)
+    valores, grades = _valores(m, estoque_max, falta_max, faixas)
+    qnt, pag, total = _seguir(m, valores, grades, estoque_max, falta_max)
+    fixo_dre = meses * ((p.alserra, p.alpraia)[loc] + (p.movserra / p.vuserra, p.movpraia / p.vupraia)[loc] + p.despmktfx)
+    lucro_pd = total - fixo_dre - (0.0, p.despmktadc)[mkt]
+    if refinar:
+        qnt, pag = _refinar(loc, mkt, rec, qnt, pag, p, raio, custeio, passos=10 * meses)
+    r = simular_lote(np.array([loc]), np.array([mkt]), np.array([rec]), qnt[None], pag[None], p, custeio)
+    return Plano(
+        local=ROTULOS_LOCAL[loc],
+        marketing=ROTULOS_MARKETING[mkt],
+        recebimento=ROTULOS_RECEBIMENTO[rec],
+        qnt=tuple(int(x) for x in qnt),
+        pag=tuple(ROTULOS_PAGAMENTO[c] for c in pag),
+        lucro=float(r.lucro_trimestre[0]),
+        caixa_final=float(r.caixa[0, -1]),
+        lucro_pd=float(lucro_pd),
+    )
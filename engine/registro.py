@@ -0,0 +1,137 @@
+# ======= resultados compactos: um registro NumPy estruturado por decisão =======
+"""
+Cada decisão avaliada vira um registro de tamanho fixo (342 bytes com 3 meses):
+os códigos da decisão, as quantidades em pacotes (int32) e todos os valores
+mensais em centavos int64 (valores do motor engine.centavos, exatos). Os valores
+não cabem em int32 em decisões comuns (o CMV de março pela fórmula do R passa de
+R$ 21 milhões com compras de ~130 pacotes). Um array de registros é criado em
+lote sem nenhum objeto Python por decisão, grava e lê em binário (.npy com
+memmap, ou bytes crus) e guarda tudo o que a DRE e o e-mail precisam: nada é
+recalculado nem extraído de texto. Um milhão de resultados ocupa ~340 MB.
+"""
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+
+from email_helper import Params, corpo_da_dre
+from engine.batch import (
+    MESES,
+    ROTULOS_LOCAL,
+    ROTULOS_MARKETING,
+    ROTULOS_PAGAMENTO,
+    ROTULOS_RECEBIMENTO,
+)
+from engine.centavos import reais, simular_lote_centavos
+from engine.dre import DRE
+
+QUANTIDADES = ("demanda", "saldo", "venda")  # pacotes
+VALORES = (  # centavos; despfin negativa, como em ResultadoLote
+    "receita", "cmv", "pagamentos", "fc", "caixa", "despfin",
+    "aluguel", "deprec", "despmkt", "despcartao", "despinad", "lucro",
+)
+_LIMITE = np.iinfo(np.int32).max
+
+
+@lru_cache(maxsize=8)
+def dtype_registro(meses: int = MESES) -> np.dtype:
+    """um registro: decisão (códigos e quantidades) + cada campo mensal como um vetor [meses]"""
+    return np.dtype(
+        [("local", np.uint8), ("marketing", np.uint8), ("recebimento", np.uint8), ("pag", np.uint8, (meses,))]
+        + [(campo, np.int32, (meses,)) for campo in ("qnt",) + QUANTIDADES]
+        + [(campo, np.int64, (meses,)) for campo in VALORES]
+    )
+
+
+REGISTRO = dtype_registro()
+
+
+def _int32(campo: str, valores: np.ndarray) -> np.ndarray:
+    if valores.size and np.abs(valores).max() > _LIMITE:
+        raise OverflowError(f"{campo} fora de int32 (pacotes)")
+    return valores
+
+
+def registrar(
+    local: np.ndarray,
+    marketing: np.ndarray,
+    recebimento: np.ndarray,
+    qnt: np.ndarray,
+    pag: np.ndarray,
+    params: Optional[Params] = None,
+    custeio: str = "r",
+) -> np.ndarray:
+    """avalia as decisões (códigos, como em simular_lote) e devolve um array (n,) de registros"""
+    qnt = np.asarray(qnt)
+    r = simular_lote_centavos(local, marketing, recebimento, qnt, pag, params, custeio)
+    n, meses = r.lucro.shape
+    reg = np.empty(n, dtype=dtype_registro(meses))
+    reg["local"], reg["marketing"], reg["recebimento"] = local, marketing, recebimento
+    reg["pag"] = pag
+    reg["qnt"] = _int32("qnt", qnt)
+    for campo in QUANTIDADES:
+        reg[campo] = _int32(campo, getattr(r, campo))
+    for campo in VALORES:
+        reg[campo] = getattr(r, campo)
+    return reg
+
+
+# ---------------------------
+# Binário
+# ---------------------------
+def salvar(caminho: str, registros: np.ndarray) -> None:
+    """grava em .npy (o dtype vai no cabeçalho)"""
+    np.save(caminho, registros)
+
+
+def carregar(caminho: str, mapear: bool = True) -> np.ndarray:
+    """lê um .npy de registros; com mapear=True só as páginas usadas saem do disco"""
+    return np.load(caminho, mmap_mode="r" if mapear else None)
+
+
+def para_bytes(registros: np.ndarray) -> bytes:
+    """bytes crus (ex.: um BLOB no SQLite); o tamanho é len(registros) * itemsize"""
+    return np.ascontiguousarray(registros).tobytes()
+
+
+def de_bytes(dados: bytes, meses: int = MESES) -> np.ndarray:
+    return np.frombuffer(dados, dtype=dtype_registro(meses))
+
+
+# ---------------------------
+# Leitura de um registro
+# ---------------------------
+def decisao(reg: np.void) -> tuple:
+    """(local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3) com os rótulos do app"""
+    return (
+        ROTULOS_LOCAL[reg["local"]],
+        ROTULOS_MARKETING[reg["marketing"]],
+        ROTULOS_RECEBIMENTO[reg["recebimento"]],
+        *(int(q) for q in reg["qnt"]),
+        *(ROTULOS_PAGAMENTO[pg] for pg in reg["pag"]),
+    )
+
+
+def dre(reg: np.void) -> DRE:
+    """a mesma DRE de calcular_dre(..., centavos=True), sem simular de novo"""
+    def linha(campo: str, sinal: int = 1):
+        return tuple(float(v) for v in sinal * reais(reg[campo]))
+
+    return DRE(
+        venda=tuple(float(v) for v in reg["venda"]),
+        receita=linha("receita"),
+        cmv=linha("cmv"),
+        aluguel=linha("aluguel"),
+        deprec=linha("deprec"),
+        despmkt=linha("despmkt"),
+        despcartao=linha("despcartao"),
+        despinad=linha("despinad"),
+        despfin=linha("despfin", -1),
+        lucro=linha("lucro"),
+        caixa=linha("caixa"),
+    )
+
+
+def corpo_email(nome: str, reg: np.void, params: Optional[Params] = None) -> str:
+    """o mesmo e-mail de submissao.avaliar_submissao: corpo_da_dre sobre dre(reg)"""
+    return corpo_da_dre(nome, decisao(reg), dre(reg), params)
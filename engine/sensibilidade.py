@@ -0,0 +1,165 @@
+# ======= sensibilidade do ótimo a cada campo de Params (tornado) =======
+from dataclasses import astuple, dataclass, fields, replace
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from email_helper import Params, fmt
+from engine.batch import LOCAIS, codificar_decisoes, simular_lote
+from engine.solver import Decisao, melhores_decisoes
+
+
+@dataclass
+class Sensibilidade:
+    campo: str
+    base: float
+    lucro_menos: float  # lucro ótimo com o campo em base·(1 − delta)
+    lucro_mais: float  # lucro ótimo com o campo em base·(1 + delta)
+    elasticidade: float  # variação % do lucro ótimo por 1% no campo (diferença central)
+    decisao_muda: bool  # a decisão ótima muda em algum dos dois lados
+    empate_local: Optional[float]  # valor do campo em que o melhor local troca (mais perto da base)
+
+    @property
+    def amplitude(self) -> float:
+        return abs(self.lucro_mais - self.lucro_menos)
+
+
+@dataclass
+class RelatorioSensibilidade:
+    otimo: Decisao
+    delta: float
+    itens: List[Sensibilidade]  # ordem do tornado: maior amplitude primeiro
+
+    def texto(self) -> str:
+        linhas = [
+            f"Ótimo: {self.otimo.local}, {self.otimo.marketing}, {self.otimo.recebimento}, "
+            f"q={self.otimo.qnt}, pag={self.otimo.pag}, lucro R$ {fmt(self.otimo.lucro)}",
+            f"{'campo':<12} {'base':>10} {f'-{self.delta:.0%}':>14} {f'+{self.delta:.0%}':>14} {'elast.':>7}  troca de local em",
+        ]
+        for s in self.itens:
+            empate = "-" if s.empate_local is None else f"{s.empate_local:.6g} ({s.empate_local / s.base - 1:+.1%})"
+            linhas.append(
+                f"{s.campo:<12} {s.base:>10.6g} {s.lucro_menos:>14.2f} {s.lucro_mais:>14.2f} "
+                f"{s.elasticidade:>7.2f}{'*' if s.decisao_muda else ' '} {empate}"
+            )
+        linhas.append("* a decisão ótima muda dentro de ±delta")
+        return "\n".join(linhas)
+
+
+# ---------------------------
+# Soluções em cache
+# ---------------------------
+@lru_cache(maxsize=1024)
+def _resolver(chave_params: tuple, local: Optional[str], k: int = 1) -> Tuple[Decisao, ...]:
+    """melhores_decisoes por tupla de Params; a base e os pontos repetidos não são resolvidos de novo"""
+    return tuple(melhores_decisoes(Params(*chave_params), k=k, local=local))
+
+
+def _chave(d: Decisao) -> tuple:
+    return (d.local, d.marketing, d.recebimento) + d.qnt + d.pag
+
+
+def _candidatos(decisoes: Sequence[Decisao]) -> Tuple[np.ndarray, ...]:
+    unicas = list(dict.fromkeys(_chave(d) for d in decisoes))
+    return codificar_decisoes(unicas)
+
+
+def _melhor_por_local(cand: Tuple[np.ndarray, ...], p: Params) -> np.ndarray:
+    """(locais,) maior lucro entre os candidatos de cada local"""
+    lucro = simular_lote(*cand, p).lucro_trimestre
+    melhor = np.full(len(LOCAIS), -np.inf)
+    np.maximum.at(melhor, cand[0], lucro)
+    return melhor
+
+
+def _empate(campo: str, base: Params, cand, multiplicadores: np.ndarray, iteracoes: int) -> Optional[float]:
+    """
+    Valor do campo, o mais perto da base, em que o melhor local troca. Varre os
+    multiplicadores com os candidatos em cache (um simular_lote por ponto) e
+    refina o primeiro intervalo com troca por bisseção, com o solver exato.
+    """
+    valor = getattr(base, campo)
+
+    def diferenca(m: float, exato: bool) -> float:
+        p = replace(base, **{campo: valor * m})
+        if exato:
+            serra, praia = (_resolver(astuple(p), loc)[0].lucro for loc in LOCAIS)
+            return serra - praia
+        serra, praia = _melhor_por_local(cand, p)
+        return serra - praia
+
+    sinal = np.sign(diferenca(1.0, True))
+    melhor: Optional[float] = None
+    for lado in (multiplicadores[multiplicadores > 1], multiplicadores[multiplicadores < 1][::-1]):
+        anterior = 1.0
+        for m in lado:
+            if np.sign(diferenca(m, False)) != sinal:
+                # confirma com o solver e refina entre o último ponto sem troca e este
+                if np.sign(diferenca(m, True)) == sinal:
+                    anterior = m
+                    continue
+                a, b = anterior, m
+                for _ in range(iteracoes):
+                    meio = (a + b) / 2
+                    a, b = (meio, b) if np.sign(diferenca(meio, True)) == sinal else (a, meio)
+                if melhor is None or abs(b - 1) < abs(melhor - 1):
+                    melhor = b
+                break
+            anterior = m
+    return None if melhor is None else valor * melhor
+
+
+def analisar_sensibilidade(
+    params: Optional[Params] = None,
+    campos: Optional[Sequence[str]] = None,
+    delta: float = 0.1,
+    faixa: Tuple[float, float] = (0.5, 2.0),
+    pontos: int = 41,
+    candidatos: int = 50,
+    iteracoes: int = 12,
+) -> RelatorioSensibilidade:
+    """
+    Para cada campo de Params (todos, ou `campos`): lucro ótimo com o campo em
+    ±delta (resolvido com melhores_decisoes), elasticidade do lucro ótimo, se a
+    decisão ótima muda, e o valor do campo em que Serra e Praia do Canto trocam de
+    posição, procurado entre base·faixa[0] e base·faixa[1]. Os itens saem em ordem
+    de tornado (maior amplitude do lucro ótimo primeiro).
+
+    Os `candidatos` melhores de cada local na base e os ótimos de cada local em
+    ±delta e nas pontas da faixa ficam em cache; a varredura da faixa só avalia
+    esses candidatos, e o solver exato entra apenas para confirmar e refinar uma
+    troca de local.
+    """
+    base = params or Params()
+    chave = astuple(base)
+    otimo = _resolver(chave, None)[0]
+    nomes = list(campos) if campos else [f.name for f in fields(Params)]
+    base_local = [d for loc in LOCAIS for d in _resolver(chave, loc, candidatos)]
+    multiplicadores = np.geomspace(faixa[0], faixa[1], pontos)
+
+    itens = []
+    for campo in nomes:
+        valor = float(getattr(base, campo))
+        if valor == 0:
+            continue  # sem escala para a variação relativa
+        lados: Dict[float, Decisao] = {}
+        extras = []
+        for m in (1 - delta, 1 + delta, faixa[0], faixa[1]):
+            p = astuple(replace(base, **{campo: valor * m}))
+            if m in (1 - delta, 1 + delta):
+                lados[m] = _resolver(p, None)[0]
+            extras += [_resolver(p, loc)[0] for loc in LOCAIS]
+        menos, mais = lados[1 - delta].lucro, lados[1 + delta].lucro
+        elasticidade = (mais - menos) / (2 * delta * otimo.lucro) if otimo.lucro else float("nan")
+        itens.append(Sensibilidade(
+            campo=campo,
+            base=valor,
+            lucro_menos=menos,
+            lucro_mais=mais,
+            elasticidade=elasticidade,
+            decisao_muda=any(_chave(d) != _chave(otimo) for d in lados.values()),
+            empate_local=_empate(campo, base, _candidatos(base_local + extras), multiplicadores, iteracoes),
+        ))
+    itens.sort(key=lambda s: -s.amplitude)
+    return RelatorioSensibilidade(otimo, delta, itens)
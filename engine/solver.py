@@ -0,0 +1,293 @@
+# ======= busca das decisões que maximizam o lucro do trimestre =======
+from dataclasses import dataclass
+from itertools import combinations, product
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from email_helper import Params
+from engine.batch import (
+    LOCAIS,
+    MARKETINGS,
+    MESES,
+    PAGAMENTOS,
+    RECEBIMENTOS,
+    ROTULOS_LOCAL,
+    ROTULOS_MARKETING,
+    ROTULOS_PAGAMENTO,
+    ROTULOS_RECEBIMENTO,
+    _codigo,
+    simular_lote,
+    tabela_demanda,
+)
+
+ADIANTADO = PAGAMENTOS.index("adiantado")
+_FOLGA = 1e-9  # tolerância relativa nas comparações teto x corte
+
+
+@dataclass
+class Decisao:
+    local: str
+    marketing: str
+    recebimento: str
+    qnt: Tuple[int, int, int]
+    pag: Tuple[str, str, str]
+    lucro: float
+
+
+def _ramos() -> np.ndarray:
+    """todas as escolhas categóricas (local, marketing, recebimento, pag1, pag2, pag3).
+    Adiantado no mês 1 fica de fora: não existe mês anterior para o adiantamento."""
+    pags = [pg for pg in product(range(len(PAGAMENTOS)), repeat=MESES) if pg[0] != ADIANTADO]
+    return np.array([
+        (loc, mkt, rec) + pg
+        for loc in range(len(LOCAIS))
+        for mkt in range(len(MARKETINGS))
+        for rec in range(len(RECEBIMENTOS))
+        for pg in pags
+    ], dtype=np.intp)
+
+
+# ---------------------------
+# Tetos (limites superiores) do lucro
+# ---------------------------
+@dataclass
+class _Tetos:
+    """
+    O lucro de um ramo é
+        fixo + soma_j(unit_j * venda_j) + soma_i(despfin_i)
+    e despfin_i <= taxaesp * min(0, caixa antes dos juros acumulada até i), porque
+    os juros só reduzem o caixa. A caixa acumulada é linear em (venda, q):
+        caixa_fixo_i + soma_j(receb_ji * venda_j) - soma_j(pagto_ji * q_j).
+    O teto resultante é côncavo e linear por partes.
+    """
+    taxaesp: float
+    fixo: np.ndarray  # (ramos,)
+    unit: np.ndarray  # (ramos, 3) margem por unidade vendida
+    caixa_fixo: np.ndarray  # (ramos, 3) capital + aluguel/móveis/marketing acumulados
+    receb: np.ndarray  # (ramos, 3 vendido, 3 acumulado)
+    pagto: np.ndarray  # (ramos, 3 comprado, 3 acumulado)
+    teto: np.ndarray  # (ramos,) teto do ramo inteiro
+
+    def pontos(self, r: int, qf: np.ndarray, venda: np.ndarray) -> np.ndarray:
+        """teto para cada ponto (3, m) do ramo r"""
+        caixa = self.caixa_fixo[r][:, None] + self.receb[r].T @ venda - self.pagto[r].T @ qf
+        return self.fixo[r] + self.unit[r] @ venda + self.taxaesp * np.minimum(caixa, 0).sum(axis=0)
+
+
+def _tetos(p: Params, ramos: np.ndarray, demanda: np.ndarray, piso: np.ndarray, margem: int) -> _Tetos:
+    """
+    Sem estoque sobrando (margem == 0) venda == q, cada unidade custa o próprio mês e o
+    teto do ramo é o máximo exato (contínuo) da função côncava na caixa [piso, demanda].
+    Com sobra, usa o menor custo disponível até o mês e ignora os pagamentos.
+    """
+    loc, mkt, rec, pag = ramos[:, 0], ramos[:, 1], ramos[:, 2], ramos[:, 3:]
+    vc, vb, tc, ti = p.vendacart, p.vendaboleto, p.taxacart, p.taxainad
+    pv_liq = p.pv * (1 - np.array([0.0, vc * tc, vc * tc + vb * ti])[rec])
+    custo = p.pc * np.array([1.0, p.jurcomp, p.descomp])[pag] + p.transp
+    if margem > 0:
+        custo = np.minimum.accumulate(custo, axis=1)
+    unit = pv_liq[:, None] - custo
+    aluguel = np.array([p.alserra, p.alpraia])[loc]
+    deprec = np.array([p.movserra / p.vuserra, p.movpraia / p.vupraia])[loc]
+    fixo = -MESES * (aluguel + deprec + p.despmktfx) - np.array([0.0, p.despmktadc])[mkt]
+
+    # fluxo de caixa mês a mês, acumulado no fim
+    n = len(ramos)
+    caixa_fixo = np.empty((n, MESES))
+    caixa_fixo[:] = -(np.array([p.alserra + p.movserra / 3, p.alpraia + p.movpraia / 3])[loc] + p.despmktfx)[:, None]
+    caixa_fixo[:, 0] += p.capital - np.array([0.0, p.despmktadc])[mkt]
+    k = np.array([
+        [1.0, 0.0, 0.0],
+        [1 - vc, vc * (1 - tc), 0.0],
+        [1 - vc - vb, vc * (1 - tc) + vb / 3 * (1 - ti), vb / 3 * (1 - ti)],
+    ])[rec]
+    receb = np.zeros((n, MESES, MESES))
+    pagto = np.zeros((n, MESES, MESES))
+    parc = p.pc * p.jurcomp / 3
+    # parcelas como em generate_email_body: pagparc = [0, t1+t2, t1+t2+t3]
+    meses_parc = {0: (1, 2), 1: (1, 2), 2: (2,)}
+    for j in range(MESES):
+        for t in range(j, MESES):
+            receb[:, j, t] = p.pv * k[:, t - j]
+        pagto[:, j, j] = p.transp + np.where(pag[:, j] == 0, p.pc, 0.0)
+        for t in meses_parc[j]:
+            pagto[:, j, t] += np.where(pag[:, j] == 1, parc, 0.0)
+        if j > 0:
+            pagto[:, j, j - 1] += np.where(pag[:, j] == ADIANTADO, p.pc * p.descomp, 0.0)
+    caixa_fixo = np.cumsum(caixa_fixo, axis=1)
+    receb = np.cumsum(receb, axis=2)
+    pagto = np.cumsum(pagto, axis=2)
+
+    tetos = _Tetos(p.taxaesp, fixo, unit, caixa_fixo, receb, pagto, np.empty(n))
+    d = demanda[loc, mkt, rec].astype(np.float64)
+    if margem > 0:
+        caixa_max = np.einsum("rj,rji->ri", d, receb)
+        tetos.teto = fixo + (np.maximum(unit, 0) * d).sum(axis=1) + p.taxaesp * np.minimum(caixa_fixo + caixa_max, 0).sum(axis=1)
+    else:
+        tetos.teto = _max_na_caixa(tetos, piso.astype(np.float64), d)
+    return tetos
+
+
+def _max_na_caixa(t: _Tetos, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """
+    Máximo do teto côncavo (venda == q) na caixa lo <= q <= hi, por ramo.
+    O máximo de uma função côncava linear por partes está num vértice do arranjo
+    formado pelos planos "caixa_i == 0" e pelas faces da caixa: basta testar cada
+    trio de restrições ativas.
+    """
+    n = len(t.fixo)
+    b = t.receb - t.pagto  # (ramos, j, i): caixa_i = caixa_fixo_i + soma_j b_ji q_j
+    # restrições como linhas a.q = c: 3 planos de caixa, 3 pisos e 3 tetos
+    eye = np.broadcast_to(np.eye(MESES), (n, MESES, MESES))
+    a = np.concatenate([b.transpose(0, 2, 1), eye, eye], axis=1)
+    c = np.concatenate([-t.caixa_fixo, lo, hi], axis=1)
+    trios = np.array(list(combinations(range(3 * MESES), MESES)))
+    m = a[:, trios]  # (ramos, trios, 3, 3)
+    rhs = c[:, trios]
+    ok = np.abs(np.linalg.det(m)) > 1e-9
+    m[~ok] = np.eye(MESES)
+    q = np.linalg.solve(m, rhs[..., None])[..., 0]
+    ok &= ((q >= lo[:, None] - 1e-6) & (q <= hi[:, None] + 1e-6)).all(axis=2)
+    q = np.clip(q, lo[:, None], hi[:, None])
+    caixa = t.caixa_fixo[:, None] + np.einsum("rtj,rji->rti", q, b)
+    valor = t.fixo[:, None] + np.einsum("rtj,rj->rt", q, t.unit) + t.taxaesp * np.minimum(caixa, 0).sum(axis=2)
+    return np.where(ok, valor, -np.inf).max(axis=1)
+
+
+# ---------------------------
+# Candidatos por ramo
+# ---------------------------
+def _candidatos_sem_sobra(t: _Tetos, r: int, lo: np.ndarray, hi: np.ndarray, corte: float) -> np.ndarray:
+    """
+    Quantidades (m, 3) do ramo r com teto >= corte, sem estoque sobrando.
+    Primeiro poda os pares (q1, q2) pelo melhor q3 possível (máximo 1-D nos pontos de
+    quebra), depois expande q3 só para os pares que sobraram.
+    """
+    q1, q2 = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1), indexing="ij")
+    q12 = np.stack([q1.ravel(), q2.ravel()]).astype(np.float64)
+    b = t.receb[r] - t.pagto[r]
+    alfa = t.caixa_fixo[r][:, None] + b[:2].T @ q12  # (3, pares)
+    beta = b[2]
+    # q3 candidatos: extremos e onde cada caixa_i cruza zero
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quebra = np.where(beta[:, None] != 0, -alfa / beta[:, None], lo[2])
+    q3 = np.clip(np.concatenate([np.full((1, alfa.shape[1]), lo[2]), np.full((1, alfa.shape[1]), hi[2]), quebra]), lo[2], hi[2])
+    caixa = alfa[:, None, :] + beta[:, None, None] * q3[None]
+    valor = (
+        t.fixo[r] + t.unit[r, :2] @ q12 + t.unit[r, 2] * q3
+        + t.taxaesp * np.minimum(caixa, 0).sum(axis=0)
+    )
+    pares = q12[:, valor.max(axis=0) >= corte].astype(np.int64)
+    if not pares.shape[1]:
+        return np.empty((0, MESES), dtype=np.int64)
+    n3 = int(hi[2] - lo[2] + 1)
+    q = np.stack([np.repeat(pares[0], n3), np.repeat(pares[1], n3), np.tile(np.arange(lo[2], hi[2] + 1), pares.shape[1])])
+    qf = q.astype(np.float64)
+    return q[:, t.pontos(r, qf, qf) >= corte].T
+
+
+def _regiao(demanda: np.ndarray, margem: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """quantidades (3, m) com estoque disponível <= demanda do mês + margem, e as vendas resultantes"""
+    d1, d2, d3 = (int(x) for x in demanda)
+    q1 = np.arange(d1 + margem + 1)
+    s1 = np.maximum(0, q1 - d1)
+    n2 = d2 + margem + 1 - s1
+    q1 = np.repeat(q1, n2)
+    s1 = np.repeat(s1, n2)
+    q2 = np.arange(len(q1)) - np.repeat(np.cumsum(n2) - n2, n2)
+    s2 = np.maximum(0, s1 + q2 - d2)
+    n3 = d3 + margem + 1 - s2
+    q = np.stack([np.repeat(q1, n3), np.repeat(q2, n3), np.arange(n3.sum()) - np.repeat(np.cumsum(n3) - n3, n3)])
+    s1, s2 = np.repeat(s1, n3), np.repeat(s2, n3)
+    venda = np.stack([q[0] - s1, s1 + q[1] - s2, np.minimum(s2 + q[2], d3)]).astype(np.float64)
+    return q, q.astype(np.float64), venda
+
+
+# ---------------------------
+# Branch and bound
+# ---------------------------
+def melhores_decisoes(
+    params: Optional[Params] = None, k: int = 10, margem: int = 0, local: Optional[str] = None
+) -> List[Decisao]:
+    """
+    Top-k decisões por lucro do trimestre (branch and bound sobre simular_lote).
+
+    Quantidades: o estoque disponível no mês nunca passa da demanda do mês + `margem`.
+    Com margem == 0 nunca sobra estoque e a busca é exata. Com margem > 0 o teto
+    supõe o estoque final avaliado a custo; a fórmula do R para março (base com
+    compra2qnt) pode inflar esse estoque, então resultados com sobra devem ser lidos
+    com cuidado. Um mês sem compra aparece sempre com pagamento "À vista".
+    Com `local`, só as decisões nesse local.
+    """
+    p = params or Params()
+    tab = tabela_demanda(params=p)
+    ramos = _ramos()
+    if local is not None:
+        ramos = ramos[ramos[:, 0] == _codigo(local, LOCAIS)]
+    dem = tab[ramos[:, 0], ramos[:, 1], ramos[:, 2]]
+    # mês com pagamento diferente de à vista precisa ter compra (senão é a mesma decisão)
+    piso = (ramos[:, 3:] != 0).astype(np.int64)
+    tetos = _tetos(p, ramos, tab, piso, margem)
+
+    # corte inicial: cada ramo comprando a demanda dos meses com margem positiva
+    q0 = np.where(tetos.unit > 0, dem, 0)
+    pag0 = np.where(q0 > 0, ramos[:, 3:], 0)
+    r0 = simular_lote(ramos[:, 0], ramos[:, 1], ramos[:, 2], q0, pag0, p)
+    # ramos diferentes podem cair na mesma decisão (pagamento de mês sem compra)
+    _, unicos = np.unique(np.column_stack([ramos[:, :3], pag0, q0]), axis=0, return_index=True)
+    corte = _kesimo(r0.lucro_trimestre[unicos], k)
+
+    melhores_lucro = np.empty(0)
+    melhores_ramo = np.empty(0, dtype=np.intp)
+    melhores_q = np.empty((0, MESES), dtype=np.int64)
+    regioes: Dict[Tuple[int, int, int], Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+    for r in np.argsort(-tetos.teto, kind="stable"):
+        # folga para o arredondamento: o teto pode coincidir com o lucro do corte
+        limite = corte - _FOLGA * max(1.0, abs(corte))
+        if tetos.teto[r] < limite:
+            break  # todos os ramos seguintes têm teto ainda menor
+        chave = tuple(int(x) for x in ramos[r, :3])
+        pag = ramos[r, 3:]
+        if margem == 0:
+            qs = _candidatos_sem_sobra(tetos, r, piso[r], dem[r], limite)
+        else:
+            if chave not in regioes:
+                regioes[chave] = _regiao(tab[chave], margem)
+            q, qf, venda = regioes[chave]
+            sel = tetos.pontos(r, qf, venda) >= limite
+            sel &= (q >= piso[r][:, None]).all(axis=0)
+            qs = q[:, sel].T
+        m = len(qs)
+        if not m:
+            continue
+        loc, mkt, rec = chave
+        res = simular_lote(
+            np.full(m, loc), np.full(m, mkt), np.full(m, rec), qs, np.broadcast_to(pag, (m, MESES)), p
+        )
+        melhores_lucro = np.concatenate([melhores_lucro, res.lucro_trimestre])
+        melhores_ramo = np.concatenate([melhores_ramo, np.full(m, r)])
+        melhores_q = np.concatenate([melhores_q, qs])
+        if len(melhores_lucro) > k:
+            topo = np.argpartition(-melhores_lucro, k - 1)[:k]
+            melhores_lucro, melhores_ramo, melhores_q = melhores_lucro[topo], melhores_ramo[topo], melhores_q[topo]
+        corte = max(corte, _kesimo(melhores_lucro, k))
+
+    saida = []
+    for i in np.argsort(-melhores_lucro, kind="stable"):
+        loc, mkt, rec = ramos[melhores_ramo[i], :3]
+        saida.append(Decisao(
+            local=ROTULOS_LOCAL[loc],
+            marketing=ROTULOS_MARKETING[mkt],
+            recebimento=ROTULOS_RECEBIMENTO[rec],
+            qnt=tuple(int(x) for x in melhores_q[i]),
+            pag=tuple(ROTULOS_PAGAMENTO[pg] for pg in ramos[melhores_ramo[i], 3:]),
+            lucro=float(melhores_lucro[i]),
+        ))
+    return saida
+
+
+def _kesimo(lucros: np.ndarray, k: int) -> float:
+    if len(lucros) < k:
+        return -np.inf
+    return float(np.partition(lucros, len(lucros) - k)[len(lucros) - k])
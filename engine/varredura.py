@@ -0,0 +1,216 @@
+# ======= varredura de Params em paralelo, resultados em memória compartilhada =======
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, fields, replace
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from email_helper import Params
+from engine.batch import MESES, simular_lote
+
+Progresso = Callable[[int, int], None]  # (avaliações feitas, total)
+
+
+@dataclass
+class Varredura:
+    """
+    Lucro de cada decisão em cada ponto da grade. `lucro` tem a forma da grade
+    (um eixo por campo, na ordem de `campos`) mais um eixo de decisões; com
+    melhor=True o eixo de decisões some e `melhor` guarda o índice da decisão de
+    maior lucro em cada ponto.
+    """
+    campos: Tuple[str, ...]
+    eixos: Tuple[np.ndarray, ...]
+    lucro: np.ndarray
+    melhor: Optional[np.ndarray] = None
+
+    def params(self, indice: Tuple[int, ...], base: Optional[Params] = None) -> Params:
+        """Params do ponto `indice` da grade"""
+        return replace(base or Params(), **{c: float(e[i]) for c, e, i in zip(self.campos, self.eixos, indice)})
+
+
+# ---------------------------
+# Lado dos processos do pool
+# ---------------------------
+_ESTADO: dict = {}
+
+
+def _anexar(nome: str, forma: Tuple[int, ...], dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    # o resource_tracker é o do processo principal, que cria e remove o segmento
+    shm = shared_memory.SharedMemory(name=nome)
+    return shm, np.ndarray(forma, dtype=dtype, buffer=shm.buf)
+
+
+def _guardar(cod: np.ndarray, res: np.ndarray, base: Params, campos: Tuple[str, ...],
+             eixos: Tuple[np.ndarray, ...], melhor: bool) -> None:
+    _ESTADO.update(
+        cod=cod, res=res, base=base, campos=campos, eixos=eixos, melhor=melhor,
+        forma=tuple(len(e) for e in eixos),
+    )
+
+
+def _iniciar_processo(decisoes: Tuple[str, Tuple[int, ...]], resultado: Tuple[str, Tuple[int, ...]], *resto) -> None:
+    shm_dec, cod = _anexar(*decisoes, np.int64)
+    shm_res, res = _anexar(*resultado, np.float64)
+    _ESTADO["shm"] = (shm_dec, shm_res)  # mantém os segmentos abertos enquanto o processo viver
+    _guardar(cod, res, *resto)
+
+
+def _avaliar(pontos: Tuple[int, int], decisoes: Tuple[int, int], fatia: int) -> int:
+    """avalia os pontos [a, b) x decisões [c, d) e grava direto no array compartilhado"""
+    e = _ESTADO
+    (a, b), (c, d) = pontos, decisoes
+    cod = e["cod"][c:d]
+    loc, mkt, rec, qnt, pag = cod[:, 0], cod[:, 1], cod[:, 2], cod[:, 3:3 + MESES], cod[:, 3 + MESES:]
+    for k in range(a, b):
+        indice = np.unravel_index(k, e["forma"])
+        p = replace(e["base"], **{campo: float(eixo[i]) for campo, eixo, i in zip(e["campos"], e["eixos"], indice)})
+        lucro = simular_lote(loc, mkt, rec, qnt, pag, p).lucro_trimestre
+        if e["melhor"]:
+            j = int(np.argmax(lucro))
+            e["res"][k, fatia] = (lucro[j], c + j)
+        else:
+            e["res"][k, c:d] = lucro
+    return (b - a) * (d - c)
+
+
+# ---------------------------
+# Processo principal
+# ---------------------------
+def _tarefas(pontos: int, decisoes: int, por_fatia: int, alvo: int) -> List[Tuple[Tuple[int, int], Tuple[int, int], int]]:
+    """ladrilhos (pontos, decisões, fatia de decisões) com ~`alvo` avaliações cada"""
+    fatias = [(c, min(decisoes, c + por_fatia)) for c in range(0, decisoes, por_fatia)]
+    passo = max(1, alvo // min(decisoes, por_fatia))
+    return [((a, min(pontos, a + passo)), fatia, f) for a in range(0, pontos, passo) for f, fatia in enumerate(fatias)]
+
+
+def varrer(
+    grade: Dict[str, Sequence[float]],
+    local: np.ndarray,
+    marketing: np.ndarray,
+    recebimento: np.ndarray,
+    qnt: np.ndarray,
+    pag: np.ndarray,
+    params: Optional[Params] = None,
+    melhor: bool = False,
+    processos: Optional[int] = None,
+    decisoes_por_tarefa: int = 100_000,
+    avaliacoes_por_tarefa: int = 500_000,
+    progresso: Optional[Progresso] = None,
+) -> Varredura:
+    """
+    Avalia as decisões (códigos, como em simular_lote) em todos os pontos do produto
+    cartesiano de `grade` (campo de Params -> valores); os campos fora da grade
+    ficam como em `params`.
+
+    A grade × decisões é dividida em ladrilhos de ~`avaliacoes_por_tarefa`
+    avaliações, distribuídos num ProcessPoolExecutor. Decisões e resultados ficam
+    em multiprocessing.shared_memory: cada processo lê as decisões e escreve o seu
+    ladrilho direto no array de resultados, sem copiar nada de volta pelo pool, e
+    os ladrilhos são independentes (escala com o número de núcleos). `progresso`
+    é chamado a cada ladrilho concluído. Com melhor=True cada ladrilho guarda só o
+    máximo da sua fatia de decisões, e o resultado final é (grade,) em vez de
+    (grade, decisões): útil quando a matriz inteira não caberia na memória.
+    """
+    base = params or Params()
+    validos = {f.name for f in fields(Params)}
+    desconhecidos = set(grade) - validos
+    if desconhecidos:
+        raise ValueError(f"campos de Params desconhecidos na grade: {sorted(desconhecidos)}")
+    if len(qnt) == 0:
+        raise ValueError("nenhuma decisão para avaliar")
+    campos = tuple(grade)
+    eixos = tuple(np.asarray(grade[c], dtype=np.float64) for c in campos)
+    forma = tuple(len(e) for e in eixos)
+    pontos = int(np.prod(forma))
+
+    cod = np.column_stack([local, marketing, recebimento, qnt, pag]).astype(np.int64)
+    n = len(cod)
+    tarefas = _tarefas(pontos, n, decisoes_por_tarefa, avaliacoes_por_tarefa)
+    fatias = -(-n // decisoes_por_tarefa)
+    forma_res = (pontos, fatias, 2) if melhor else (pontos, n)
+    processos = processos or os.cpu_count() or 1
+
+    shm_dec = shared_memory.SharedMemory(create=True, size=max(1, cod.nbytes))
+    shm_res = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(forma_res)) * 8))
+    compartilhado = res = None
+    try:
+        compartilhado = np.ndarray(cod.shape, dtype=np.int64, buffer=shm_dec.buf)
+        compartilhado[:] = cod
+        res = np.ndarray(forma_res, dtype=np.float64, buffer=shm_res.buf)
+        resto = (base, campos, eixos, melhor)
+        total, feitas = pontos * n, 0
+        if processos == 1:
+            _guardar(compartilhado, res, *resto)
+            for t in tarefas:
+                feitas += _avaliar(*t)
+                if progresso:
+                    progresso(feitas, total)
+        else:
+            iniciar = ((shm_dec.name, cod.shape), (shm_res.name, forma_res)) + resto
+            with ProcessPoolExecutor(processos, initializer=_iniciar_processo, initargs=iniciar) as pool:
+                for futuro in as_completed([pool.submit(_avaliar, *t) for t in tarefas]):
+                    feitas += futuro.result()
+                    if progresso:
+                        progresso(feitas, total)
+        if melhor:
+            j = np.argmax(res[:, :, 0], axis=1)
+            lucro = res[np.arange(pontos), j, 0].reshape(forma)
+            indice = res[np.arange(pontos), j, 1].astype(np.int64).reshape(forma)
+            return Varredura(campos, eixos, lucro, indice)
+        return Varredura(campos, eixos, res.reshape(forma + (n,)).copy())
+    finally:
+        _ESTADO.clear()
+        del compartilhado, res  # as views precisam sumir antes de fechar os segmentos
+        shm_dec.close()
+        shm_res.close()
+        shm_dec.unlink()
+        shm_res.unlink()
+
+
+if __name__ == "__main__":
+    import argparse
+    import itertools
+    import sys
+    import time
+
+    from engine.batch import LOCAIS, MARKETINGS, PAGAMENTOS, RECEBIMENTOS
+
+    parser = argparse.ArgumentParser(description="Melhor decisão (q <= teto) em cada ponto de uma grade de Params.")
+    parser.add_argument(
+        "--campo", action="append", required=True, metavar="NOME=INICIO:FIM:PONTOS",
+        help="campo de Params a varrer (repetível), ex.: taxaesp=0.1:0.2:5, mercserra2=0.3:0.5:5; "
+             f"campos: {', '.join(f.name for f in fields(Params))}",
+    )
+    parser.add_argument("--teto", type=int, default=20)
+    parser.add_argument("--processos", type=int, default=None)
+    args = parser.parse_args()
+
+    grade = {}
+    for campo in args.campo:
+        nome, intervalo = campo.split("=")
+        inicio, fim, n = intervalo.split(":")
+        grade[nome] = np.linspace(float(inicio), float(fim), int(n))
+    cat = np.array(list(itertools.product(
+        range(len(LOCAIS)), range(len(MARKETINGS)), range(len(RECEBIMENTOS)), *[range(len(PAGAMENTOS))] * MESES,
+    )))
+    cat = cat[cat[:, 3] != PAGAMENTOS.index("adiantado")]  # sem mês anterior para adiantar (como no solver)
+    q = np.indices((args.teto + 1,) * MESES).reshape(MESES, -1).T
+    cat, q = np.repeat(cat, len(q), axis=0), np.tile(q, (len(cat), 1))
+
+    inicio = time.perf_counter()
+
+    def mostrar(feitas: int, total: int) -> None:
+        decorrido = time.perf_counter() - inicio
+        print(f"\r{feitas}/{total} avaliações ({feitas / max(decorrido, 1e-9):,.0f}/s)", end="", file=sys.stderr)
+
+    v = varrer(grade, cat[:, 0], cat[:, 1], cat[:, 2], q, cat[:, 3:], melhor=True,
+               processos=args.processos, progresso=mostrar)
+    print(file=sys.stderr)
+    for indice in np.ndindex(v.lucro.shape):
+        i = v.melhor[indice]
+        ponto = ", ".join(f"{c}={e[j]:g}" for c, e, j in zip(v.campos, v.eixos, indice))
+        print(f"{ponto}: lucro {v.lucro[indice]:.2f} com local={LOCAIS[cat[i, 0]]} marketing={MARKETINGS[cat[i, 1]]} "
+              f"recebimento={RECEBIMENTOS[cat[i, 2]]} q={tuple(int(x) for x in q[i])} pag={tuple(PAGAMENTOS[c] for c in cat[i, 3:])}")
@@ -1,25 +1,256 @@
-import pandas as pd
-
-# Função para salvar respostas no CSV
-def salvar_csv(nome, email, local, marketing, recebimento, compra1qnt, compra1pag, compra2qnt, compra2pag, compra3qnt, compra3pag, resultado):
-    # Criando um DataFrame com as respostas
-    data = {
-        "Nome": [nome],
-        "E-mail": [email],
-        "Local": [local],
-        "Marketing": [marketing],
-        "Recebimento": [recebimento],
-        "Compra 1 Qtd": [compra1qnt],
-        "Compra 1 Pag": [compra1pag],
-        "Compra 2 Qtd": [compra2qnt],
-        "Compra 2 Pag": [compra2pag],
-        "Compra 3 Qtd": [compra3qnt],
-        "Compra 3 Pag": [compra3pag],
-        "Resultado": [resultado]
-    }
-    
-    # Criando DataFrame
-    df = pd.DataFrame(data)
-    
-    # Salvando no arquivo CSV (com opção de adicionar novas linhas)
-    df.to_csv('respostas.csv', mode='a', header=False, index=False)
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from engine.batch import codificar_decisoes
+from submission_store import COLUNAS, SubmissionStore
+
+PLANILHA_ID = os.getenv("PLANILHA_ID")
+PLANILHA_ABA = os.getenv("PLANILHA_ABA", "respostas")
+CREDENCIAIS_GOOGLE = os.getenv("CREDENCIAIS_GOOGLE", "credenciais.json")
+
+# ---------------------------
+# Conexão com o Google Sheets
+# ---------------------------
+def abrir_planilha():
+    """autentica com a conta de serviço e devolve a aba de respostas (gspread.Worksheet)"""
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    if not PLANILHA_ID:
+        raise RuntimeError("Configurar PLANILHA_ID no ambiente (Secrets).")
+    escopos = ["https://www.googleapis.com/auth/spreadsheets"]
+    credenciais = ServiceAccountCredentials.from_json_keyfile_name(CREDENCIAIS_GOOGLE, escopos)
+    planilha = gspread.authorize(credenciais).open_by_key(PLANILHA_ID)
+    try:
+        return planilha.worksheet(PLANILHA_ABA)
+    except gspread.exceptions.WorksheetNotFound:
+        return planilha.add_worksheet(PLANILHA_ABA, rows=1000, cols=len(COLUNAS) + 1)
+
+
+def _linha_planilha(linha: tuple) -> list:
+    id_, criada_em, *resto = linha
+    data = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(criada_em))
+    return [id_, data] + ["" if valor is None else valor for valor in resto]
+
+
+class SheetsSink:
+    """
+    Espelha o SubmissionStore numa planilha do Google. O próprio SQLite é a fila:
+    a cada `intervalo` segundos as submissões novas saem em blocos de até `lote`
+    linhas, cada bloco numa única chamada append_rows (a cota de escrita do Sheets
+    é por requisição, não por linha).
+
+    A coluna A guarda o id da submissão; ao (re)abrir a aba o cursor volta a ser o
+    maior id já presente nela, então uma queda entre o envio e o registro não
+    duplica linhas. Se a API falhar (cota, rede, credencial), nada se perde: as
+    linhas continuam no SQLite e o envio é refeito com espera exponencial.
+    """
+
+    def __init__(
+        self,
+        store: SubmissionStore,
+        abrir: Callable[[], object] = abrir_planilha,
+        lote: int = 500,
+        intervalo: float = 5.0,
+        espera_max: float = 300.0,
+    ):
+        self.store = store
+        self.abrir = abrir
+        self.lote = lote
+        self.intervalo = intervalo
+        self.espera_max = espera_max
+        self._aba = None
+        self._cursor: Optional[int] = None
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.falhas = 0
+
+    def _abrir_aba(self):
+        if self._aba is None:
+            aba = self.abrir()
+            ids = [int(v) for v in aba.col_values(1) if str(v).isdigit()]
+            if not aba.row_values(1):
+                aba.append_rows([["id"] + COLUNAS], value_input_option="RAW")
+            self._aba, self._cursor = aba, max(ids, default=0)
+        return self._aba
+
+    def sincronizar(self) -> int:
+        """envia tudo que ainda não está na planilha; retorna quantas linhas subiram"""
+        with self._lock:
+            try:
+                aba = self._abrir_aba()
+                enviadas = 0
+                while not self._parar.is_set():
+                    linhas = self.store.linhas_desde(self._cursor, self.lote)
+                    if not linhas:
+                        break
+                    aba.append_rows([_linha_planilha(l) for l in linhas], value_input_option="RAW")
+                    self._cursor = linhas[-1][0]
+                    enviadas += len(linhas)
+                return enviadas
+            except BaseException:
+                # cliente pode ter expirado; na próxima rodada autentica e relê o cursor
+                self._aba = None
+                raise
+
+    def _loop(self) -> None:
+        while not self._parar.is_set():
+            self._acordar.clear()
+            try:
+                self.sincronizar()
+                self.falhas = 0
+                espera = self.intervalo
+            except Exception as erro:
+                self.falhas += 1
+                espera = min(self.espera_max, self.intervalo * 2 ** self.falhas)
+                print(f"SheetsSink: envio para a planilha falhou ({erro!r}), nova tentativa em {espera:.0f}s.")
+            self._acordar.wait(espera)
+
+    def iniciar(self) -> "SheetsSink":
+        if self._thread and self._thread.is_alive():
+            return self
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._loop, name="planilha", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout: float = 10.0) -> None:
+        self._parar.set()
+        self._acordar.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+# ---------------------------
+# Espelho local da planilha (leitura incremental)
+# ---------------------------
+_INTEIRAS = {"id", "compra1qnt", "compra2qnt", "compra3qnt"}
+_REAIS = {"receita", "cmv", "despfin", "lucro", "caixa_final"}
+
+_SCHEMA_ESPELHO = """
+CREATE TABLE IF NOT EXISTS espelho (
+    linha INTEGER PRIMARY KEY,
+    valores TEXT NOT NULL
+);
+"""
+
+
+def _coluna(n: int) -> str:
+    """1 -> A, 19 -> S, 27 -> AA"""
+    letras = ""
+    while n:
+        n, resto = divmod(n - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+class EspelhoPlanilha:
+    """
+    Cópia local (SQLite) da aba de respostas. A planilha só recebe linhas no fim,
+    então `atualizar` pede apenas o intervalo depois da última linha já vista
+    (uma chamada de leitura, vazia quando não há nada novo) em vez de baixar a
+    aba inteira. A linha 1 é o cabeçalho.
+
+    `tabela` devolve as colunas como arrays numpy e `decisoes` já entrega os
+    códigos no formato de engine.batch.simular_lote.
+    """
+
+    def __init__(self, abrir: Callable[[], object] = abrir_planilha, caminho: str = "espelho.db"):
+        self.abrir = abrir
+        self._aba = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(_SCHEMA_ESPELHO)
+        self._linhas: List[list] = [json.loads(v) for (v,) in self._conn.execute("SELECT valores FROM espelho ORDER BY linha")]
+        self._colunar: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def cabecalho(self) -> List[str]:
+        return list(self._linhas[0]) if self._linhas else ["id"] + COLUNAS
+
+    def atualizar(self) -> int:
+        """baixa as linhas novas da planilha; retorna quantas chegaram"""
+        with self._lock:
+            if self._aba is None:
+                self._aba = self.abrir()
+            primeira = len(self._linhas) + 1
+            try:
+                novas = self._aba.get(
+                    f"A{primeira}:{_coluna(len(COLUNAS) + 1)}", value_render_option="UNFORMATTED_VALUE"
+                )
+            except BaseException:
+                self._aba = None
+                raise
+            if not novas:
+                return 0
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO espelho (linha, valores) VALUES (?, ?)",
+                [(primeira + i, json.dumps(linha)) for i, linha in enumerate(novas)],
+            )
+            self._conn.execute("COMMIT")
+            self._linhas.extend(novas)
+            self._colunar = None
+            return len(novas)
+
+    def tabela(self) -> Dict[str, np.ndarray]:
+        """coluna -> array (inteiros e valores em números, o resto como texto)"""
+        with self._lock:
+            if self._colunar is None:
+                cabecalho = self.cabecalho
+                dados = [linha + [""] * (len(cabecalho) - len(linha)) for linha in self._linhas[1:]]
+                colunas = list(zip(*dados)) if dados else [()] * len(cabecalho)
+                tabela = {}
+                for nome, valores in zip(cabecalho, colunas):
+                    if nome in _INTEIRAS:
+                        tabela[nome] = np.array([int(v) if v != "" else 0 for v in valores], dtype=np.int64)
+                    elif nome in _REAIS:
+                        tabela[nome] = np.array([float(v) if v != "" else np.nan for v in valores], dtype=np.float64)
+                    else:
+                        tabela[nome] = np.array([str(v) for v in valores], dtype=object)
+                self._colunar = tabela
+            return self._colunar
+
+    def decisoes(self):
+        """(local, marketing, recebimento, qnt, pag) de todas as linhas, para simular_lote"""
+        t = self.tabela()
+        return codificar_decisoes(zip(
+            t["local"], t["marketing"], t["recebimento"],
+            t["compra1qnt"], t["compra2qnt"], t["compra3qnt"],
+            t["compra1pag"], t["compra2pag"], t["compra3pag"],
+        ))
+
+    def __len__(self) -> int:
+        return max(0, len(self._linhas) - 1)
+
+
+# ---------------------------
+# Interface antiga
+# ---------------------------
+_STORE = None
+_SINK = None
+_STORE_LOCK = threading.Lock()
+
+def _store() -> SubmissionStore:
+    """um store (e um sink) por processo, mesmo com várias sessões chamando ao mesmo tempo"""
+    global _STORE, _SINK
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = SubmissionStore()
+            if PLANILHA_ID:
+                _SINK = SheetsSink(_STORE).iniciar()
+    return _STORE
+
+# Função para salvar respostas (antes: uma linha por chamada em respostas.csv; agora no SubmissionStore)
+def salvar_csv(nome, email, local, marketing, recebimento, compra1qnt, compra1pag, compra2qnt, compra2pag, compra3qnt, compra3pag, resultado, dre=None):
+    decisao = (local, marketing, recebimento, compra1qnt, compra2qnt, compra3qnt, compra1pag, compra2pag, compra3pag)
+    # a gravação é feita pela thread escritora, em grupo; o recibo permite esperar o commit
+    return _store().salvar(nome, email, decisao, resultado, dre)
@@ -0,0 +1,104 @@
+# ======= variantes reduzidas e comprimidas das imagens da página =======
+import html
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+PASTA_ESTATICA = os.path.join(PASTA, "static")  # servida pelo Streamlit em app/static/
+URL_ESTATICA = "app/static"
+LARGURAS = (480, 960, 1536)
+# formato -> (extensão, tipo MIME, opções do Pillow)
+FORMATOS: Dict[str, tuple] = {
+    "webp": ("webp", "image/webp", {"quality": 80, "method": 6}),
+    "jpeg": ("jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+@dataclass(frozen=True)
+class Variante:
+    formato: str
+    largura: int
+    altura: int
+    arquivo: str  # nome dentro de PASTA_ESTATICA
+    tamanho: int  # bytes
+
+    @property
+    def url(self) -> str:
+        return f"{URL_ESTATICA}/{self.arquivo}"
+
+
+def gerar_variantes(
+    origem: str,
+    destino: str = PASTA_ESTATICA,
+    larguras: Sequence[int] = LARGURAS,
+    formatos: Sequence[str] = tuple(FORMATOS),
+) -> List[Variante]:
+    """
+    Gera `origem` reduzida para cada largura (nunca ampliada) em cada formato, em
+    `destino`. Um arquivo já gerado depois da última modificação da origem é
+    reaproveitado, então chamar de novo (build ou início do app) só custa um stat.
+    """
+    from PIL import Image
+
+    base = os.path.splitext(os.path.basename(origem))[0]
+    os.makedirs(destino, exist_ok=True)
+    modificada = os.path.getmtime(origem)
+    variantes = []
+    with Image.open(origem) as imagem:
+        largura_origem, altura_origem = imagem.size
+        for largura in sorted({min(l, largura_origem) for l in larguras}):
+            altura = round(altura_origem * largura / largura_origem)
+            reduzida = None
+            for formato in formatos:
+                extensao, _, opcoes = FORMATOS[formato]
+                arquivo = f"{base}-{largura}.{extensao}"
+                caminho = os.path.join(destino, arquivo)
+                if not os.path.exists(caminho) or os.path.getmtime(caminho) < modificada:
+                    if reduzida is None:
+                        reduzida = imagem.convert("RGB").resize((largura, altura), Image.LANCZOS)
+                    temporario = caminho + ".tmp"
+                    reduzida.save(temporario, format=formato.upper(), **opcoes)
+                    os.replace(temporario, caminho)  # quem lê nunca vê arquivo pela metade
+                variantes.append(Variante(formato, largura, altura, arquivo, os.path.getsize(caminho)))
+    return variantes
+
+
+def html_responsivo(variantes: Sequence[Variante], alt: str = "", sizes: str = "100vw") -> str:
+    """
+    <picture> com srcset por formato: o navegador baixa só a variante que cabe na
+    largura da tela (e na densidade de pixels), em WebP quando suporta.
+    """
+    por_formato: Dict[str, List[Variante]] = {}
+    for v in variantes:
+        por_formato.setdefault(v.formato, []).append(v)
+    fontes = []
+    for formato, lista in por_formato.items():
+        srcset = ", ".join(f"{v.url} {v.largura}w" for v in lista)
+        fontes.append(f'<source type="{FORMATOS[formato][1]}" srcset="{srcset}" sizes="{sizes}">')
+    # fallback do <img>: a menor variante do último formato (o mais compatível)
+    padrao = min(lista, key=lambda v: v.largura)
+    return (
+        "<picture>" + "".join(fontes)
+        + f'<img src="{padrao.url}" width="{padrao.largura}" height="{padrao.altura}" alt="{html.escape(alt)}"'
+        + ' decoding="async" style="width:100%;height:auto">'
+        + "</picture>"
+    )
+
+
+def menor_variante(variantes: Sequence[Variante], largura_min: int, formato: str = "webp") -> Optional[Variante]:
+    """menor variante do formato com pelo menos `largura_min` px (ou a maior que houver)"""
+    lista = sorted((v for v in variantes if v.formato == formato), key=lambda v: v.largura)
+    for v in lista:
+        if v.largura >= largura_min:
+            return v
+    return lista[-1] if lista else None
+
+
+if __name__ == "__main__":
+    # no build: python imagens.py pagina1.png
+    for origem in sys.argv[1:] or [os.path.join(PASTA, "pagina1.png")]:
+        total = os.path.getsize(origem)
+        for v in gerar_variantes(origem):
+            print(f"{v.arquivo}: {v.largura}x{v.altura}, {v.tamanho / 1024:.0f} KiB ({v.tamanho / total:.1%} da origem)")
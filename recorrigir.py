@@ -0,0 +1,255 @@
+# ======= recorreção em lote das submissões gravadas =======
+"""
+Recalcula os resultados de todas as submissões de um CSV (o respostas.csv antigo,
+sem cabeçalho, ou o exportado por SubmissionStore.exportar_csv) e regrava os
+resultados e os corpos de e-mail. Uso:
+
+    python recorrigir.py respostas.csv --saida resultados.csv
+    python recorrigir.py respostas.csv --corpos corpos.jsonl
+    python recorrigir.py respostas.csv --params params.json --reenviar
+    python recorrigir.py respostas.csv --perfil r
+
+O arquivo é lido em blocos; cada bloco vai para um processo do pool e no máximo
+2 blocos por processo ficam em memória ao mesmo tempo. Os números saem do motor
+vetorizado em centavos (os mesmos do app); o texto do e-mail (corpo_da_dre, a
+partir da DRE em centavos) só é montado com --corpos ou --reenviar.
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import fields, replace
+from email.mime.text import MIMEText
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from email_helper import PERFIL, PERFIS, Params, corpo_da_dre, perfil
+from engine.batch import codificar_decisao
+from engine.centavos import reais, simular_lote_centavos
+from engine.dre import DRE
+
+# ordem das colunas no respostas.csv antigo (gsheet_helper.salvar_csv, sem cabeçalho)
+COLUNAS_ANTIGAS = [
+    "nome", "email", "local", "marketing", "recebimento",
+    "compra1qnt", "compra1pag", "compra2qnt", "compra2pag", "compra3qnt", "compra3pag", "resultado",
+]
+_DECISAO = [
+    "local", "marketing", "recebimento",
+    "compra1qnt", "compra2qnt", "compra3qnt", "compra1pag", "compra2pag", "compra3pag",
+]
+SAIDA = ["linha", "nome", "email"] + _DECISAO + ["receita", "cmv", "despfin", "lucro", "caixa_final", "erro"]
+
+# ---------------------------
+# Lado dos processos do pool
+# ---------------------------
+_PARAMS: Optional[Params] = None
+
+
+def _iniciar_processo(params: Params) -> None:
+    global _PARAMS
+    _PARAMS = params
+
+
+def _dres(r) -> List[DRE]:
+    """a DRE de cada decisão do bloco, como calcular_dre(..., centavos=True), a partir de `r`"""
+    def linhas(x: np.ndarray) -> list:
+        return reais(x).tolist()
+
+    campos = zip(
+        r.venda.astype(float).tolist(), linhas(r.receita), linhas(r.cmv), linhas(r.aluguel),
+        linhas(r.deprec), linhas(r.despmkt), linhas(r.despcartao), linhas(r.despinad),
+        linhas(-r.despfin), linhas(r.lucro), linhas(r.caixa),
+    )
+    return [DRE(*(tuple(v) for v in c)) for c in campos]
+
+
+def _corrigir_bloco(bloco: List[tuple], com_corpo: bool = True) -> List[tuple]:
+    """[(linha, nome, email, decisao)] -> [(linha_saida, corpo, ok)]"""
+    validas, codigos, saida = [], [], []
+    for i, (linha, nome, email, decisao) in enumerate(bloco):
+        try:
+            codigos.append(codificar_decisao(decisao))
+        except (ValueError, TypeError) as erro:
+            saida.append(([linha, nome, email, *decisao, "", "", "", "", "", str(erro)], None, False))
+            continue
+        validas.append(i)
+        saida.append(None)
+    if codigos:
+        cod = np.array(codigos, dtype=np.int64)
+        r = simular_lote_centavos(cod[:, 0], cod[:, 1], cod[:, 2], cod[:, 3:6], cod[:, 6:], _PARAMS)
+        receita = reais(r.receita.sum(axis=1))
+        cmv = reais(r.cmv.sum(axis=1))
+        despfin = reais(r.despfin.sum(axis=1))
+        lucro = reais(r.lucro_trimestre)
+        caixa = reais(r.caixa[:, -1])
+        dres = _dres(r) if com_corpo else None
+        for j, i in enumerate(validas):
+            linha, nome, email, decisao = bloco[i]
+            corpo = corpo_da_dre(nome, decisao, dres[j], _PARAMS) if com_corpo else None
+            valores = [round(float(v[j]), 2) for v in (receita, cmv, despfin, lucro, caixa)]
+            saida[i] = ([linha, nome, email, *decisao, *valores, ""], corpo, True)
+    return saida
+
+
+# ---------------------------
+# Leitura em blocos
+# ---------------------------
+def _inteiro(valor: str):
+    try:
+        return int(float(valor))
+    except (ValueError, OverflowError):  # "abc", "inf", "1e400"
+        return valor  # vira erro na codificação, sem derrubar o bloco
+
+
+def ler_submissoes(caminho: str) -> Iterator[tuple]:
+    """(linha, nome, email, decisao) de cada submissão, sem carregar o arquivo inteiro"""
+    with open(caminho, newline="", encoding="utf-8") as f:
+        leitor = csv.reader(f)
+        primeira = next(leitor, None)
+        if primeira is None:
+            return
+        if primeira and primeira[0] == "id":
+            colunas, inicio = primeira, 2
+            pendentes = leitor
+        else:
+            colunas, inicio = COLUNAS_ANTIGAS, 1
+            pendentes = itertools.chain([primeira], leitor)
+        pos = {nome: i for i, nome in enumerate(colunas)}
+        idx_decisao = [pos[c] for c in _DECISAO]
+        for n, row in enumerate(pendentes, start=inicio):
+            if not row:
+                continue
+            decisao = tuple(row[i] if i < len(row) else "" for i in idx_decisao)
+            decisao = decisao[:3] + tuple(_inteiro(q) for q in decisao[3:6]) + decisao[6:]
+            yield n, row[pos["nome"]], row[pos["email"]], decisao
+
+
+def _blocos(itens: Iterator[tuple], tamanho: int) -> Iterator[List[tuple]]:
+    while True:
+        bloco = list(itertools.islice(itens, tamanho))
+        if not bloco:
+            return
+        yield bloco
+
+
+def _ler_params(caminho: Optional[str], nome_perfil: str = PERFIL) -> Params:
+    """o perfil, com os campos do JSON (se houver) por cima"""
+    base = perfil(nome_perfil)
+    if not caminho:
+        return base
+    with open(caminho, encoding="utf-8") as f:
+        valores = json.load(f)
+    validos = {c.name for c in fields(Params)}
+    desconhecidos = set(valores) - validos
+    if desconhecidos:
+        raise SystemExit(f"parâmetros desconhecidos em {caminho}: {sorted(desconhecidos)}")
+    return replace(base, **valores)
+
+
+# ---------------------------
+# Execução
+# ---------------------------
+def recorrigir(
+    entrada: str,
+    saida: str = "resultados.csv",
+    corpos: Optional[str] = None,
+    params: Optional[Params] = None,
+    processos: Optional[int] = None,
+    bloco: int = 5000,
+    outbox=None,
+    remetente: Optional[str] = None,
+) -> dict:
+    """
+    Recorrige `entrada` e grava `saida` (CSV) e, se pedido, `corpos` (JSONL, um e-mail por linha).
+    Com `outbox`, enfileira o e-mail recalculado de cada aluno; a chave da mensagem
+    é o hash do destinatário + corpo, então rodar de novo não duplica o envio.
+    """
+    params = params or perfil()
+    processos = processos or os.cpu_count() or 1
+    contagem = {"linhas": 0, "erros": 0, "enfileirados": 0}
+
+    def escrever(resultado: List[tuple]) -> None:
+        for linha_saida, corpo, ok in resultado:
+            escritor.writerow(linha_saida)
+            contagem["linhas"] += 1
+            if not ok:
+                contagem["erros"] += 1
+                continue
+            if corpo is None:
+                continue
+            email = linha_saida[2]
+            if f_corpos is not None:
+                f_corpos.write(json.dumps({"linha": linha_saida[0], "email": email, "corpo": corpo}, ensure_ascii=False) + "\n")
+            if outbox is not None and email:
+                msg = MIMEText(corpo, "plain", "utf-8")
+                msg["Subject"] = "Respostas da Atividade Competitiva (corrigidas)"
+                msg["From"] = remetente
+                msg["To"] = email
+                chave = "recorrecao-" + hashlib.sha1(f"{email}\n{corpo}".encode()).hexdigest()
+                outbox.enfileirar(remetente, [email], msg.as_string(), chave=chave)
+                contagem["enfileirados"] += 1
+
+    com_corpo = corpos is not None or outbox is not None
+    with ExitStack() as pilha:
+        f_saida = pilha.enter_context(open(saida, "w", newline="", encoding="utf-8"))
+        f_corpos = pilha.enter_context(open(corpos, "w", encoding="utf-8")) if corpos else None
+        pool = pilha.enter_context(
+            ProcessPoolExecutor(processos, initializer=_iniciar_processo, initargs=(params,))
+        )
+        escritor = csv.writer(f_saida)
+        escritor.writerow(SAIDA)
+        # janela limitada: no máximo 2 blocos por processo em voo, na ordem do arquivo
+        em_voo = deque()
+        for b in _blocos(ler_submissoes(entrada), bloco):
+            em_voo.append(pool.submit(_corrigir_bloco, b, com_corpo))
+            if len(em_voo) >= 2 * processos:
+                escrever(em_voo.popleft().result())
+        while em_voo:
+            escrever(em_voo.popleft().result())
+    return contagem
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Recalcula resultados e e-mails de todas as submissões.")
+    parser.add_argument("entrada", nargs="?", default="respostas.csv")
+    parser.add_argument("--saida", default="resultados.csv")
+    parser.add_argument("--corpos", help="JSONL com o e-mail recalculado de cada aluno")
+    parser.add_argument("--perfil", default=PERFIL, choices=sorted(PERFIS), help="perfil de Params (padrão: o do app)")
+    parser.add_argument("--params", help="JSON com os campos do perfil a alterar")
+    parser.add_argument("--processos", type=int, default=None)
+    parser.add_argument("--bloco", type=int, default=5000)
+    parser.add_argument("--reenviar", action="store_true", help="enfileira os e-mails corrigidos no outbox")
+    parser.add_argument("--outbox", default="outbox.db")
+    args = parser.parse_args(argv)
+
+    outbox = remetente = None
+    if args.reenviar:
+        from email_outbox import Outbox
+        remetente = os.getenv("EMAIL")
+        if not remetente:
+            raise SystemExit("Configurar EMAIL no ambiente para reenviar.")
+        # só grava na fila; quem envia é a thread do outbox do app
+        outbox = Outbox(args.outbox)
+
+    inicio = time.perf_counter()
+    contagem = recorrigir(
+        args.entrada, args.saida, args.corpos, _ler_params(args.params, args.perfil),
+        args.processos, args.bloco, outbox, remetente,
+    )
+    print(
+        f"{contagem['linhas']} submissões em {time.perf_counter() - inicio:.1f}s "
+        f"({contagem['erros']} com erro, {contagem['enfileirados']} e-mails enfileirados)."
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
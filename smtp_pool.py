@@ -0,0 +1,138 @@
+# ======= sessões SMTP reaproveitadas entre envios =======
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+
+def _conexao_morta(erro: OSError) -> bool:
+    """servidor fechou, 421, timeout, reset... (recusas da mensagem não contam)"""
+    if isinstance(erro, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(erro, smtplib.SMTPResponseException):
+        return erro.smtp_code == 421
+    return not isinstance(erro, smtplib.SMTPException)
+
+
+class _Sessao:
+    def __init__(self, servidor: smtplib.SMTP):
+        self.servidor = servidor
+        self.enviadas = 0
+        self.usada_em = time.monotonic()
+
+
+class PoolSMTP:
+    """
+    Mantém até `tamanho` conexões SMTP autenticadas abertas e as reaproveita.
+
+    `conectar` devolve uma conexão já com login (ex.: email_outbox.conectar_gmail).
+    Uma sessão ociosa há mais de `ocioso_max` segundos é testada com NOOP antes de
+    voltar a ser usada; uma que caiu no meio do envio é descartada e o envio é
+    refeito uma vez numa conexão nova. Depois de `max_por_sessao` mensagens a
+    sessão é renovada (o Gmail limita mensagens por conexão).
+    """
+
+    def __init__(
+        self,
+        conectar: Callable[[], smtplib.SMTP],
+        tamanho: int = 2,
+        ocioso_max: float = 30.0,
+        max_por_sessao: int = 90,
+    ):
+        self.conectar = conectar
+        self.tamanho = tamanho
+        self.ocioso_max = ocioso_max
+        self.max_por_sessao = max_por_sessao
+        self._livres: List[_Sessao] = []
+        self._lock = threading.Lock()
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self.conexoes_abertas = 0  # sessões abertas agora (emprestadas ou livres)
+
+    def _nova(self) -> _Sessao:
+        sessao = _Sessao(self.conectar())
+        with self._lock:
+            self.conexoes_abertas += 1
+        return sessao
+
+    def _viva(self, sessao: _Sessao) -> bool:
+        if sessao.enviadas >= self.max_por_sessao:
+            return False
+        if time.monotonic() - sessao.usada_em < self.ocioso_max:
+            return True
+        try:
+            return sessao.servidor.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _fechar(self, sessao: _Sessao) -> None:
+        with self._lock:
+            self.conexoes_abertas -= 1
+        try:
+            sessao.servidor.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                sessao.servidor.close()
+            except OSError:
+                pass
+
+    @contextmanager
+    def sessao(self) -> Iterator[_Sessao]:
+        """empresta uma sessão viva; se a conexão der problema ela é descartada"""
+        with self._vagas:
+            sessao = None
+            while sessao is None:
+                with self._lock:
+                    if not self._livres:
+                        break
+                    candidata = self._livres.pop()
+                # NOOP e QUIT fora do lock: um servidor lento não trava os outros envios
+                if self._viva(candidata):
+                    sessao = candidata
+                else:
+                    self._fechar(candidata)
+            if sessao is None:
+                sessao = self._nova()
+            try:
+                yield sessao
+            except OSError as erro:
+                # recusa da mensagem (sendmail já fez RSET): a conexão continua boa
+                if _conexao_morta(erro):
+                    self._fechar(sessao)
+                else:
+                    self._devolver(sessao)
+                raise
+            except BaseException:
+                self._fechar(sessao)
+                raise
+            self._devolver(sessao)
+
+    def _devolver(self, sessao: _Sessao) -> None:
+        sessao.usada_em = time.monotonic()
+        with self._lock:
+            self._livres.append(sessao)
+
+    def enviar(self, remetente: str, destinatarios: List[str], mensagem: str) -> None:
+        """envia pela sessão do pool; se a conexão tinha caído, refaz uma vez numa nova"""
+        for tentativa in range(2):
+            try:
+                with self.sessao() as s:
+                    s.servidor.sendmail(remetente, destinatarios, mensagem)
+                    s.enviadas += 1
+                return
+            except OSError as erro:
+                if tentativa or not _conexao_morta(erro):
+                    raise
+
+    def fechar_ociosas(self, idade: float = 0.0) -> None:
+        """fecha sessões paradas há mais de `idade` segundos"""
+        agora = time.monotonic()
+        with self._lock:
+            manter = [s for s in self._livres if agora - s.usada_em < idade]
+            fechar = [s for s in self._livres if agora - s.usada_em >= idade]
+            self._livres = manter
+        for s in fechar:
+            self._fechar(s)
+
+    def fechar(self) -> None:
+        self.fechar_ociosas(0.0)
@@ -0,0 +1,44 @@
+# ======= submissão: a decisão avaliada uma vez, reaproveitada por todos =======
+from dataclasses import dataclass
+from typing import Optional
+
+from email_helper import Params, corpo_da_dre
+from engine.dre import DRE, calcular_dre
+
+
+def resumo_decisao(decisao: tuple) -> str:
+    """o texto "Resultados:" mostrado ao aluno e gravado com a submissão"""
+    local, marketing, recebimento, compra1qnt, compra2qnt, compra3qnt, compra1pag, compra2pag, compra3pag = decisao
+    return f"""
+        Resultados:
+        Localização: {local}
+        Estratégia de Marketing: {marketing}
+        Política de Recebimento: {recebimento}
+        Compras Mês 1: {compra1qnt} pacotes, forma de pagamento {compra1pag}
+        Compras Mês 2: {compra2qnt} pacotes, forma de pagamento {compra2pag}
+        Compras Mês 3: {compra3qnt} pacotes, forma de pagamento {compra3pag}
+        """
+
+
+@dataclass(frozen=True)
+class Submissao:
+    nome: str
+    email: str
+    decisao: tuple  # (local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3)
+    dre: DRE
+    resultado: str  # resumo da decisão (tela e SubmissionStore)
+    corpo: str  # e-mail do aluno
+
+
+def avaliar_submissao(nome: str, email: str, decisao: tuple, params: Optional[Params] = None) -> Submissao:
+    """
+    Roda o modelo uma única vez (calcular_dre em centavos, com cache) e monta o
+    e-mail a partir da própria DRE; o mesmo objeto vai para o outbox, o digest, o
+    SubmissionStore e a confirmação na tela. Os números são os do motor exato
+    (engine.centavos), os mesmos de engine.registro e da recorreção.
+    """
+    p = params or Params()
+    decisao = tuple(decisao)
+    dre = calcular_dre(decisao, p, centavos=True)
+    corpo = corpo_da_dre(nome, decisao, dre, p)
+    return Submissao(nome, email, decisao, dre, resumo_decisao(decisao), corpo)
@@ -0,0 +1,204 @@
+# ======= armazenamento das submissões (SQLite em WAL, commit em grupo) =======
+import atexit
+import csv
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from engine.dre import DRE
+
+COLUNAS = [
+    "criada_em",
+    "nome",
+    "email",
+    "local",
+    "marketing",
+    "recebimento",
+    "compra1qnt",
+    "compra1pag",
+    "compra2qnt",
+    "compra2pag",
+    "compra3qnt",
+    "compra3pag",
+    "resultado",
+    "receita",
+    "cmv",
+    "despfin",
+    "lucro",
+    "caixa_final",
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissoes (
+    id INTEGER PRIMARY KEY,
+    criada_em REAL NOT NULL,
+    nome TEXT NOT NULL,
+    email TEXT NOT NULL,
+    local TEXT NOT NULL,
+    marketing TEXT NOT NULL,
+    recebimento TEXT NOT NULL,
+    compra1qnt INTEGER NOT NULL,
+    compra1pag TEXT NOT NULL,
+    compra2qnt INTEGER NOT NULL,
+    compra2pag TEXT NOT NULL,
+    compra3qnt INTEGER NOT NULL,
+    compra3pag TEXT NOT NULL,
+    resultado TEXT,
+    receita REAL,
+    cmv REAL,
+    despfin REAL,
+    lucro REAL,
+    caixa_final REAL
+);
+"""
+
+_INSERT = f"INSERT INTO submissoes ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})"
+
+
+class _Recibo:
+    """avisa quando a linha foi efetivamente gravada (commit)"""
+
+    def __init__(self):
+        self._evento = threading.Event()
+        self.id: Optional[int] = None
+        self.erro: Optional[BaseException] = None
+
+    def esperar(self, timeout: Optional[float] = None) -> int:
+        if not self._evento.wait(timeout):
+            raise TimeoutError("submissão ainda não gravada")
+        if self.erro is not None:
+            raise self.erro
+        return self.id
+
+
+class SubmissionStore:
+    """
+    Log só de inserção das submissões. `salvar` põe a linha numa fila e volta na hora;
+    uma thread escritora junta tudo que chegou enquanto o commit anterior rodava e
+    grava numa única transação (commit em grupo). Só essa thread escreve no banco,
+    então sessões concorrentes do Streamlit nunca intercalam escritas.
+
+    A linha só está gravada quando o recibo devolvido por `salvar` completa; quem
+    confirma a submissão para o aluno deve esperar por ele. Ao sair do processo,
+    o que ainda está na fila é gravado (atexit).
+    """
+
+    def __init__(self, caminho: str = "submissoes.db", lote_max: int = 1000):
+        self.caminho = caminho
+        self.lote_max = lote_max
+        self._fila: "queue.Queue" = queue.Queue()
+        conn = self._abrir()
+        conn.executescript(_SCHEMA)
+        conn.close()
+        self._thread = threading.Thread(target=self._escritor, name="submissoes", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def _abrir(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.caminho, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def salvar(
+        self,
+        nome: str,
+        email: str,
+        decisao: tuple,
+        resultado: str = "",
+        dre: Optional[DRE] = None,
+    ) -> _Recibo:
+        """decisao = (local, marketing, recebimento, q1, q2, q3, pag1, pag2, pag3)"""
+        local, marketing, recebimento, q1, q2, q3, p1, p2, p3 = decisao
+        linha = (
+            time.time(), nome, email, local, marketing, recebimento,
+            int(q1), p1, int(q2), p2, int(q3), p3, resultado,
+        )
+        if dre is not None:
+            linha += (sum(dre.receita), sum(dre.cmv), sum(dre.despfin), dre.lucro_trimestre, dre.caixa[-1])
+        else:
+            linha += (None,) * 5
+        recibo = _Recibo()
+        self._fila.put((linha, recibo))
+        return recibo
+
+    def _escritor(self) -> None:
+        conn = self._abrir()
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            lote = [item]
+            parar = False
+            while len(lote) < self.lote_max:
+                try:
+                    proximo = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    parar = True
+                    break
+                lote.append(proximo)
+            try:
+                self._gravar(conn, lote)
+            except Exception as erro:  # a thread não pode morrer: os próximos recibos nunca completariam
+                print(f"SubmissionStore: erro inesperado no escritor ({erro!r}).")
+                for _, recibo in lote:
+                    if not recibo._evento.is_set():
+                        recibo.erro = erro
+                        recibo._evento.set()
+            if parar:
+                break
+        conn.close()
+
+    @staticmethod
+    def _gravar(conn: sqlite3.Connection, lote: list) -> None:
+        try:
+            conn.execute("BEGIN")
+            ids = [conn.execute(_INSERT, linha).lastrowid for linha, _ in lote]
+            conn.execute("COMMIT")
+        except Exception as erro:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, recibo in lote:
+                recibo.erro = erro
+                recibo._evento.set()
+            print(f"SubmissionStore: lote de {len(lote)} não gravado ({erro!r}).")
+            return
+        for id_, (_, recibo) in zip(ids, lote):
+            recibo.id = id_
+            recibo._evento.set()
+
+    def fechar(self, timeout: float = 10.0) -> None:
+        """grava o que falta na fila e encerra a thread escritora"""
+        self._fila.put(None)
+        self._thread.join(timeout)
+
+    def linhas_desde(self, ultimo_id: int, limite: int = 500) -> List[tuple]:
+        """(id, *COLUNAS) das submissões com id > ultimo_id, em ordem de gravação"""
+        conn = self._abrir()
+        try:
+            return conn.execute(
+                f"SELECT id, {', '.join(COLUNAS)} FROM submissoes WHERE id > ? ORDER BY id LIMIT ?",
+                (ultimo_id, limite),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def exportar_csv(self, caminho: str = "respostas.csv") -> int:
+        """escreve todas as submissões num CSV com cabeçalho; retorna o número de linhas"""
+        conn = self._abrir()
+        try:
+            cur = conn.execute(f"SELECT id, {', '.join(COLUNAS)} FROM submissoes ORDER BY id")
+            with open(caminho, "w", newline="", encoding="utf-8") as f:
+                escritor = csv.writer(f)
+                escritor.writerow(["id"] + COLUNAS)
+                n = 0
+                for linha in cur:
+                    escritor.writerow(linha)
+                    n += 1
+        finally:
+            conn.close()
+        return n
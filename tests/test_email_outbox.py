@@ -0,0 +1,163 @@
+# ======= Outbox contra um servidor SMTP local =======
+import smtplib
+import socketserver
+import threading
+import time
+
+import pytest
+
+from email_outbox import Outbox
+
+
+class _SMTPLocal(socketserver.ThreadingTCPServer):
+    """servidor SMTP mínimo: recusa com 550 quem tiver "rejeitado" no endereço e
+    responde 451 às primeiras `falhas_temporarias` mensagens"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Sessao)
+        self.falhas_temporarias = 0
+        self.recebidas = []
+
+
+class _Sessao(socketserver.StreamRequestHandler):
+    def _responder(self, linha: str) -> None:
+        self.wfile.write(linha.encode() + b"\r\n")
+
+    def handle(self) -> None:
+        servidor = self.server
+        self._responder("220 localhost")
+        destinatarios, dados = [], None
+        for linha in self.rfile:
+            if dados is not None:
+                if linha.rstrip(b"\r\n") != b".":
+                    dados.append(linha)
+                    continue
+                if servidor.falhas_temporarias:
+                    servidor.falhas_temporarias -= 1
+                    self._responder("451 tente mais tarde")
+                else:
+                    servidor.recebidas.append((destinatarios, b"".join(dados)))
+                    self._responder("250 ok")
+                destinatarios, dados = [], None
+                continue
+            comando = linha.decode().strip()
+            verbo = comando[:4].upper()
+            if verbo in ("EHLO", "HELO", "NOOP", "RSET"):
+                self._responder("250 localhost")
+            elif verbo == "MAIL":
+                destinatarios = []
+                self._responder("250 ok")
+            elif verbo == "RCPT":
+                if "rejeitado" in comando:
+                    self._responder("550 caixa inexistente")
+                else:
+                    destinatarios.append(comando.split(":", 1)[1].strip(" <>"))
+                    self._responder("250 ok")
+            elif verbo == "DATA":
+                dados = []
+                self._responder("354 termine com .")
+            elif verbo == "QUIT":
+                self._responder("221 tchau")
+                return
+            else:
+                self._responder("502 não implementado")
+
+
+@pytest.fixture
+def smtp():
+    servidor = _SMTPLocal()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def outbox(smtp, tmp_path):
+    host, porta = smtp.server_address
+    caixa = Outbox(
+        str(tmp_path / "outbox.db"),
+        conectar=lambda: smtplib.SMTP(host, porta, timeout=5),
+        espera_base=0.01,
+        reserva=0.2,
+    )
+    yield caixa
+    caixa.parar()
+
+
+def _mensagem(para: str) -> str:
+    return f"From: prof@exemplo.com\r\nTo: {para}\r\nSubject: teste\r\n\r\ncorpo\r\n"
+
+
+def test_falha_temporaria_volta_para_a_fila_e_reenvia(outbox, smtp):
+    smtp.falhas_temporarias = 1
+    outbox.enfileirar("prof@exemplo.com", ["aluno@exemplo.com"], _mensagem("aluno@exemplo.com"))
+
+    assert outbox.processar_pendentes() == 0
+    assert outbox.contagem() == {"pendente": 1}
+
+    time.sleep(0.05)  # espera_base
+    assert outbox.processar_pendentes() == 1
+    assert outbox.contagem() == {"enviada": 1}
+    assert [d for d, _ in smtp.recebidas] == [["aluno@exemplo.com"]]
+
+
+def test_recusa_5xx_e_falha_permanente(outbox, smtp):
+    outbox.enfileirar("prof@exemplo.com", ["rejeitado@exemplo.com"], _mensagem("rejeitado@exemplo.com"))
+
+    assert outbox.processar_pendentes() == 0
+    assert outbox.contagem() == {"falhou": 1}
+    tentativas, erro = outbox._conn.execute("SELECT tentativas, erro FROM mensagens").fetchone()
+    assert tentativas == 1 and "550" in erro
+    assert smtp.recebidas == []
+
+
+def test_reserva_vencida_volta_para_a_fila_com_a_thread_rodando(outbox, smtp):
+    outbox.enfileirar("prof@exemplo.com", ["aluno@exemplo.com"], _mensagem("aluno@exemplo.com"))
+    # processo morto logo depois de reservar: a reserva ainda não venceu ao reiniciar
+    assert len(outbox._reservar(outbox._conn)) == 1
+    outbox.iniciar()
+    assert outbox.contagem() == {"enviando": 1}
+
+    limite = time.monotonic() + 5
+    while outbox.contagem() != {"enviada": 1} and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert outbox.contagem() == {"enviada": 1}
+    assert len(smtp.recebidas) == 1
+
+
+def test_linha_ilegivel_falha_sem_travar_a_fila(outbox, smtp):
+    outbox._conn.execute(
+        "INSERT INTO mensagens (remetente, destinatarios, mensagem, proxima_tentativa, criada_em)"
+        " VALUES ('prof@exemplo.com', 'não é json', 'x', 0, 0)"
+    )
+    outbox.enfileirar("prof@exemplo.com", ["aluno@exemplo.com"], _mensagem("aluno@exemplo.com"))
+
+    assert outbox.processar_pendentes() == 1
+    assert outbox.contagem() == {"enviada": 1, "falhou": 1}
+    assert len(smtp.recebidas) == 1
+
+
+def test_erro_inesperado_nao_derruba_a_thread(outbox, smtp):
+    enviar = outbox._pool.enviar
+    falhas = []
+
+    def enviar_com_erro(*args):
+        if not falhas:
+            falhas.append(1)
+            raise KeyError("inesperado")
+        return enviar(*args)
+
+    outbox._pool.enviar = enviar_com_erro
+    outbox.espera_base = 0.05
+    outbox.enfileirar("prof@exemplo.com", ["aluno@exemplo.com"], _mensagem("aluno@exemplo.com"))
+    outbox.iniciar()
+
+    limite = time.monotonic() + 5
+    while outbox.contagem() != {"enviada": 1} and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert falhas and outbox._thread.is_alive()
+    assert outbox.contagem() == {"enviada": 1}
@@ -0,0 +1,175 @@
+# ======= SheetsSink contra uma aba falsa em memória =======
+import threading
+import time
+
+import pytest
+
+import gsheet_helper
+from gsheet_helper import EspelhoPlanilha, SheetsSink
+from submission_store import COLUNAS, SubmissionStore
+
+DECISAO = ("Serra", "Agressivo", "Boleto", 10, 20, 30, "À vista", "Parcelado", "À vista")
+
+
+class AbaFalsa:
+    """o pedaço de gspread.Worksheet que o sink usa; `falhas` diz o que fazer nas próximas append_rows:
+    "antes" (recusa sem gravar) ou "depois" (grava e perde a resposta, como um timeout)"""
+
+    def __init__(self):
+        self.linhas = []
+        self.lotes = []
+        self.falhas = []
+        self.leituras = []
+
+    def col_values(self, coluna):
+        return [linha[coluna - 1] for linha in self.linhas]
+
+    def row_values(self, linha):
+        return list(self.linhas[linha - 1]) if len(self.linhas) >= linha else []
+
+    def append_rows(self, linhas, value_input_option=None):
+        falha = self.falhas.pop(0) if self.falhas else None
+        if falha == "antes":
+            raise ConnectionError("cota excedida")
+        self.linhas.extend(list(l) for l in linhas)
+        self.lotes.append(len(linhas))
+        if falha == "depois":
+            raise TimeoutError("resposta perdida")
+
+    def get(self, intervalo, value_render_option=None):
+        """só "A<n>:<coluna>": da linha n até o fim"""
+        self.leituras.append(intervalo)
+        primeira = int(intervalo.split(":")[0][1:])
+        return [list(linha) for linha in self.linhas[primeira - 1:]]
+
+    def ids(self):
+        return [linha[0] for linha in self.linhas[1:]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = SubmissionStore(str(tmp_path / "submissoes.db"))
+    yield s
+    s.fechar()
+
+
+def _salvar(store, n):
+    for i in range(n):
+        store.salvar(f"aluno{i}", f"a{i}@x", DECISAO, "ok").esperar(5)
+
+
+def test_envia_em_lotes_de_uma_chamada(store):
+    aba = AbaFalsa()
+    _salvar(store, 7)
+    sink = SheetsSink(store, abrir=lambda: aba, lote=3)
+
+    assert sink.sincronizar() == 7
+    assert aba.linhas[0] == ["id"] + COLUNAS
+    assert aba.lotes == [1, 3, 3, 1]  # cabeçalho e depois blocos de até `lote`
+    assert aba.ids() == list(range(1, 8))
+    assert sink.sincronizar() == 0  # nada novo, nenhuma chamada
+    assert aba.lotes == [1, 3, 3, 1]
+
+
+@pytest.mark.parametrize("falha", ["antes", "depois"])
+def test_falha_no_envio_nao_perde_nem_duplica(store, falha):
+    aba = AbaFalsa()
+    aberturas = []
+
+    def abrir():
+        aberturas.append(1)
+        return aba
+
+    _salvar(store, 5)
+    sink = SheetsSink(store, abrir=abrir, lote=2)
+    aba.falhas = [None, None, falha]  # cabeçalho, 1º bloco, e o 2º bloco falha
+    with pytest.raises((ConnectionError, TimeoutError)):
+        sink.sincronizar()
+
+    assert sink.sincronizar() == (3 if falha == "antes" else 1)
+    assert len(aberturas) == 2  # reabriu a aba e releu o cursor dela
+    assert aba.ids() == [1, 2, 3, 4, 5]
+
+
+class _EventoSemEspera(threading.Event):
+    """registra as esperas do laço em vez de dormir"""
+
+    def __init__(self, esperas):
+        super().__init__()
+        self.esperas = esperas
+
+    def wait(self, timeout=None):
+        self.esperas.append(timeout)
+        return True
+
+
+def test_laco_espera_exponencial_ate_o_maximo(store):
+    aba = AbaFalsa()
+    _salvar(store, 2)
+    sink = SheetsSink(store, abrir=lambda: aba, intervalo=1.0, espera_max=5.0)
+    aba.falhas = ["antes"] * 4
+    esperas = []
+    sink._acordar = _EventoSemEspera(esperas)
+
+    original = sink.sincronizar
+
+    def sincronizar():
+        enviadas = original()
+        sink._parar.set()  # primeira rodada que deu certo encerra o laço
+        return enviadas
+
+    sink.sincronizar = sincronizar
+    sink._loop()
+
+    assert esperas == [2.0, 4.0, 5.0, 5.0, 1.0]
+    assert sink.falhas == 0
+    assert aba.ids() == [1, 2]
+
+
+def test_store_unico_com_sessoes_concorrentes(monkeypatch):
+    criados = []
+
+    class StoreLento:
+        def __init__(self):
+            time.sleep(0.05)
+            criados.append(self)
+
+    monkeypatch.setattr(gsheet_helper, "SubmissionStore", StoreLento)
+    monkeypatch.setattr(gsheet_helper, "_STORE", None)
+    monkeypatch.setattr(gsheet_helper, "PLANILHA_ID", None)
+    threads = [threading.Thread(target=gsheet_helper._store) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(criados) == 1 and gsheet_helper._STORE is criados[0]
+
+
+def test_espelho_baixa_so_as_linhas_novas_na_ordem(store, tmp_path):
+    aba = AbaFalsa()
+    sink = SheetsSink(store, abrir=lambda: aba)
+    caminho = str(tmp_path / "espelho.db")
+    espelho = EspelhoPlanilha(abrir=lambda: aba, caminho=caminho)
+
+    _salvar(store, 3)
+    sink.sincronizar()
+    assert espelho.atualizar() == 4  # cabeçalho + 3
+    assert espelho.atualizar() == 0
+
+    _salvar(store, 2)
+    sink.sincronizar()
+    assert espelho.atualizar() == 2
+    assert aba.leituras == ["A1:S", "A5:S", "A5:S"]  # cada leitura começa depois da última linha vista
+
+    assert list(espelho.tabela()["id"]) == [1, 2, 3, 4, 5]
+    assert list(espelho.tabela()["nome"]) == [f"aluno{i}" for i in (0, 1, 2, 0, 1)]
+    assert len(espelho) == 5
+    loc, mkt, rec, qnt, pag = espelho.decisoes()
+    assert qnt.tolist() == [[10, 20, 30]] * 5
+
+    # reaberto do SQLite: as mesmas linhas, na mesma ordem, e só pede o que vier depois
+    reaberto = EspelhoPlanilha(abrir=lambda: aba, caminho=caminho)
+    assert list(reaberto.tabela()["id"]) == [1, 2, 3, 4, 5]
+    assert reaberto.atualizar() == 0
+    assert aba.leituras[-1] == "A7:S"